@@ -15,3 +15,76 @@ if DEV_MODE == "true":
     POSTGIS_PORT = ENV["DEV_POSTGIS_PORT"]
     POSTGIS_USER = ENV["DEV_POSTGIS_USER"]
     POSTGIS_PASSWORD = ENV["DEV_POSTGIS_PASSWORD"]
+
+# PostGIS 連線池（未設定時使用預設值）
+POSTGIS_POOL_SIZE = int(ENV.get("POSTGIS_POOL_SIZE") or 10)
+POSTGIS_MAX_OVERFLOW = int(ENV.get("POSTGIS_MAX_OVERFLOW") or 20)
+POSTGIS_POOL_PRE_PING = (ENV.get("POSTGIS_POOL_PRE_PING") or "true") == "true"
+POSTGIS_STATEMENT_TIMEOUT_MS = int(ENV.get("POSTGIS_STATEMENT_TIMEOUT_MS") or 5000)
+
+# 使用分區查詢後端：postgis（預設）或 local（程序內 STRtree，失敗時改用 PostGIS）
+ZONING_BACKEND = ENV.get("ZONING_BACKEND") or "postgis"
+
+# 使用分區格網快取：格網邊長（公尺）與最多快取的格數
+ZONING_CACHE_CELL_METERS = float(ENV.get("ZONING_CACHE_CELL_METERS") or 20)
+ZONING_CACHE_MAX_CELLS = int(ENV.get("ZONING_CACHE_MAX_CELLS") or 100_000)
+
+# 地理編碼快取（SQLite，跨 worker 共用）：檔案路徑、成功結果與查無結果的存活秒數
+GEOCODE_CACHE_PATH = ENV.get("GEOCODE_CACHE_PATH") or "cache/geocode.sqlite3"
+GEOCODE_CACHE_TTL_SECONDS = int(ENV.get("GEOCODE_CACHE_TTL_SECONDS") or 30 * 24 * 3600)
+GEOCODE_NEGATIVE_TTL_SECONDS = int(ENV.get("GEOCODE_NEGATIVE_TTL_SECONDS") or 24 * 3600)
+
+# 離線門牌地理編碼：門牌點位 CSV 路徑（未設定則停用）、其座標系，
+# 以及資料沒有縣市欄位時所屬的縣市（預設對應台北市門牌坐標資料）
+GAZETTEER_PATH = ENV.get("GAZETTEER_PATH") or ""
+GAZETTEER_SRID = int(ENV.get("GAZETTEER_SRID") or 3826)
+GAZETTEER_CITY = ENV.get("GAZETTEER_CITY") or "台北市"
+
+# 呼叫 ArcGIS 的並行上限與限流（每秒次數、可累積的突發次數）
+GEOCODE_MAX_WORKERS = int(ENV.get("GEOCODE_MAX_WORKERS") or 8)
+GEOCODE_RATE_PER_SECOND = float(ENV.get("GEOCODE_RATE_PER_SECOND") or 5)
+GEOCODE_BURST = int(ENV.get("GEOCODE_BURST") or 10)
+
+# POI 來源：overpass（預設，即時查詢）或 local（由 OSM extract 匯入 PostGIS，失敗時改用 Overpass）
+POI_BACKEND = ENV.get("POI_BACKEND") or "overpass"
+# 本地 POI 的 OSM extract 路徑、下載網址（未設定則不下載）與更新週期（秒）
+POI_PBF_PATH = ENV.get("POI_PBF_PATH") or "Input/taiwan-latest.osm.pbf"
+POI_PBF_URL = ENV.get("POI_PBF_URL") or ""
+POI_REFRESH_SECONDS = int(ENV.get("POI_REFRESH_SECONDS") or 24 * 3600)
+
+# Overpass POI 圖磚快取：slippy map 縮放層級、存活秒數與最多快取的圖磚數
+POI_TILE_ZOOM = int(ENV.get("POI_TILE_ZOOM") or 16)
+POI_TILE_TTL_SECONDS = int(ENV.get("POI_TILE_TTL_SECONDS") or 24 * 3600)
+POI_TILE_MAX_TILES = int(ENV.get("POI_TILE_MAX_TILES") or 5000)
+
+# POI 回應中座標的小數位數（6 位約 0.1 公尺）
+GEOJSON_PRECISION = int(ENV.get("GEOJSON_PRECISION") or 6)
+
+# 步行等時圈：步行速度（公尺/分鐘）與可查詢的最長分鐘數
+WALK_SPEED_M_PER_MIN = float(ENV.get("WALK_SPEED_M_PER_MIN") or 80)
+WALK_MAX_MINUTES = int(ENV.get("WALK_MAX_MINUTES") or 15)
+# 步行路網快取：檔案目錄、檔案更新週期（秒）與記憶體中最多保留的路網數
+WALK_GRAPH_DIR = ENV.get("WALK_GRAPH_DIR") or "cache/walk_graphs"
+WALK_GRAPH_MAX_AGE_SECONDS = int(ENV.get("WALK_GRAPH_MAX_AGE_SECONDS") or 30 * 24 * 3600)
+WALK_GRAPH_MAX_GRAPHS = int(ENV.get("WALK_GRAPH_MAX_GRAPHS") or 16)
+
+# POI 群集：縮放層級不大於此值時聚合回傳，與聚合格網邊長（像素，256 像素圖磚）
+POI_CLUSTER_MAX_ZOOM = int(ENV.get("POI_CLUSTER_MAX_ZOOM") or 16)
+POI_CLUSTER_CELL_PX = int(ENV.get("POI_CLUSTER_CELL_PX") or 64)
+
+# LLM（Ollama）同時生成的請求數上限（應與 OLLAMA_NUM_PARALLEL 相符）與每次呼叫含排隊時間的期限（秒）
+LLM_MAX_CONCURRENCY = int(ENV.get("LLM_MAX_CONCURRENCY") or 2)
+LLM_TIMEOUT_SECONDS = float(ENV.get("LLM_TIMEOUT_SECONDS") or 90)
+# Ollama 模型名稱（也是 LLM 結果快取鍵的一部分，更換模型不會沿用舊結果）
+LLM_MODEL = ENV.get("LLM_MODEL") or "gemma3:12b"
+
+# LLM 結果快取（SQLite，跨 worker 共用）：檔案路徑、存活秒數、大小上限（MB）與 POI 距離的取整單位（公尺）
+LLM_CACHE_PATH = ENV.get("LLM_CACHE_PATH") or "cache/llm.sqlite3"
+LLM_CACHE_TTL_SECONDS = int(ENV.get("LLM_CACHE_TTL_SECONDS") or 7 * 24 * 3600)
+LLM_CACHE_MAX_MB = float(ENV.get("LLM_CACHE_MAX_MB") or 64)
+LLM_CACHE_DISTANCE_STEP_M = float(ENV.get("LLM_CACHE_DISTANCE_STEP_M") or 10)
+
+# 送進 LLM 前先將 POI 彙總為各類別統計與最近的數個具名 POI（false 時沿用原始 POI 列表）、每類別列出數與估計 token 上限
+LLM_PROMPT_COMPACTION = (ENV.get("LLM_PROMPT_COMPACTION") or "true") == "true"
+LLM_PROMPT_POI_TOP_N = int(ENV.get("LLM_PROMPT_POI_TOP_N") or 5)
+LLM_PROMPT_POI_TOKEN_BUDGET = int(ENV.get("LLM_PROMPT_POI_TOKEN_BUDGET") or 800)
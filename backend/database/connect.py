@@ -1,22 +1,53 @@
 from sqlalchemy import create_engine, Engine
-
-from config.consts import POSTGIS_HOST, POSTGIS_PORT, POSTGIS_USER, POSTGIS_PASSWORD
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine
+
+from config.consts import (
+    POSTGIS_HOST,
+    POSTGIS_PORT,
+    POSTGIS_USER,
+    POSTGIS_PASSWORD,
+    POSTGIS_POOL_SIZE,
+    POSTGIS_MAX_OVERFLOW,
+    POSTGIS_POOL_PRE_PING,
+    POSTGIS_STATEMENT_TIMEOUT_MS,
+)
 
 POSTGIS_ENGINE = None
+POSTGIS_ASYNC_ENGINE = None
 
 # 替換使用者名稱、密碼、IP、資料庫名稱
+_DB_NAME = "neighborgis"
 
 
 def _create_postgis_engine() -> Engine:
     """
     Create a PostGIS engine using SQLAlchemy.
+    僅用於啟動時的資料匯入等長時間作業，因此不設定查詢逾時
     """
-    db_name = "neighborgis"
-
     # 使用者名稱、密碼、IP、資料庫名稱
     return create_engine(
-        f"postgresql://{POSTGIS_USER}:{POSTGIS_PASSWORD}@{POSTGIS_HOST}:{POSTGIS_PORT}/{db_name}"
+        f"postgresql://{POSTGIS_USER}:{POSTGIS_PASSWORD}@{POSTGIS_HOST}:{POSTGIS_PORT}/{_DB_NAME}",
+        pool_pre_ping=POSTGIS_POOL_PRE_PING,
+    )
+
+
+def _create_postgis_async_engine() -> AsyncEngine:
+    """
+    Create an asyncpg-backed PostGIS engine for request handling.
+    所有請求路徑上的查詢都應使用此 engine，避免阻塞 event loop
+    """
+    return create_async_engine(
+        f"postgresql+asyncpg://{POSTGIS_USER}:{POSTGIS_PASSWORD}@{POSTGIS_HOST}:{POSTGIS_PORT}/{_DB_NAME}",
+        pool_size=POSTGIS_POOL_SIZE,
+        max_overflow=POSTGIS_MAX_OVERFLOW,
+        pool_pre_ping=POSTGIS_POOL_PRE_PING,
+        connect_args={
+            "server_settings": {
+                "statement_timeout": str(POSTGIS_STATEMENT_TIMEOUT_MS),
+            },
+        },
     )
 
 
 POSTGIS_ENGINE = _create_postgis_engine()
+POSTGIS_ASYNC_ENGINE = _create_postgis_async_engine()
@@ -0,0 +1,224 @@
+import io
+import time
+from dataclasses import dataclass, field
+import geopandas as gpd
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import shapely
+from pyogrio import open_arrow
+from pyproj import CRS
+from sqlalchemy import Engine
+
+
+DEFAULT_BATCH_SIZE = 20_000  # 每批讀取的圖徵數，決定匯入時的記憶體上限
+TARGET_SRID = 4326  # 查詢端一律以 WGS84 進行比對
+GEOMETRY_COLUMN = "geometry"
+
+
+@dataclass
+class LoadReport:
+    """
+    單一圖層的匯入結果
+    """
+    table_name: str
+    row_count: int = 0
+    elapsed: float = 0.0
+    schema: dict = field(default_factory=dict)
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.row_count / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def copy_file_to_table(
+        engine: Engine,
+        file_path: str,
+        table_name: str,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        batch_sinks: list = ()
+) -> LoadReport:
+    """
+    以 Arrow 分批串流讀取地理檔案，透過 PostgreSQL COPY（WKB 幾何）寫入資料表。
+    記憶體用量只與 batch_size 有關，與檔案大小無關。
+    :param engine: PostGIS engine
+    :param file_path: 來源檔案路徑
+    :param table_name: 目標資料表（會先刪除再建立）
+    :param batch_size: 每批圖徵數
+    :param batch_sinks: 同一次讀取中一併接收每批資料的物件（需有 write_batch，例如快照）
+    :return: 匯入結果
+    """
+    start = time.perf_counter()
+
+    with open_arrow(file_path, batch_size=batch_size, use_pyarrow=True) as source:
+        meta, reader = source
+        geom_name = meta["geometry_name"] or "wkb_geometry"
+        return _copy_batches(
+            engine, table_name, reader.schema, reader, geom_name,
+            meta["crs"], batch_sinks, start,
+        )
+
+
+def copy_frame_to_table(
+        engine: Engine,
+        gdf: gpd.GeoDataFrame,
+        table_name: str,
+        batch_size: int = DEFAULT_BATCH_SIZE
+) -> LoadReport:
+    """
+    將記憶體中的 GeoDataFrame 以相同的 COPY 流程寫入資料表（例如需先清理欄位的 OSM 資料）
+    :param gdf: 來源資料
+    :param table_name: 目標資料表（會先刪除再建立）
+    :param batch_size: 每批圖徵數
+    :return: 匯入結果
+    """
+    start = time.perf_counter()
+    geom_name = gdf.geometry.name
+    table = pa.Table.from_pandas(
+        pd.DataFrame(gdf.drop(columns=geom_name)), preserve_index=False)
+    table = table.append_column(
+        geom_name, pa.array(shapely.to_wkb(gdf.geometry.values), type=pa.binary()))
+    crs = gdf.crs.to_string() if gdf.crs is not None else None
+    return _copy_batches(
+        engine, table_name, table.schema, table.to_batches(batch_size), geom_name,
+        crs, (), start,
+    )
+
+
+def _copy_batches(
+        engine: Engine,
+        table_name: str,
+        schema: pa.Schema,
+        batches,
+        geom_name: str,
+        crs: str | None,
+        batch_sinks,
+        start: float
+) -> LoadReport:
+    report = LoadReport(table_name=table_name)
+    source_srid = resolve_srid(crs)
+
+    attr_fields = [f for f in schema if f.name != geom_name]
+    columns = [f.name.lower() for f in attr_fields]  # 欄位全小寫
+    report.schema = {
+        "columns": {
+            name: str(f.type) for name, f in zip(columns, attr_fields)
+        },
+        "crs": crs,
+    }
+
+    raw_conn = engine.raw_connection()
+    try:
+        cursor = raw_conn.cursor()
+        cursor.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+        cursor.execute(_create_table_sql(
+            table_name, columns, attr_fields, source_srid
+        ))
+
+        quoted_cols = ", ".join(
+            f'"{col}"' for col in columns + [GEOMETRY_COLUMN])
+        copy_sql = f'COPY "{table_name}" ({quoted_cols}) FROM STDIN WITH (FORMAT csv)'
+
+        for batch in batches:
+            geoms = shapely.from_wkb(batch.column(geom_name))
+            buffer = _batch_to_csv(batch, geom_name, geoms, source_srid)
+            cursor.copy_expert(copy_sql, buffer)
+            for sink in batch_sinks:
+                sink.write_batch(batch, geom_name, geoms, source_srid)
+
+            report.row_count += batch.num_rows
+            report.elapsed = time.perf_counter() - start
+            print(
+                f"[{table_name}] 已寫入 {report.row_count} 筆"
+                f"（{report.rows_per_second:.0f} 筆/秒）"
+            )
+
+        if source_srid != TARGET_SRID:
+            cursor.execute(f"""
+                ALTER TABLE "{table_name}"
+                ALTER COLUMN {GEOMETRY_COLUMN} TYPE geometry(Geometry, {TARGET_SRID})
+                USING ST_Transform({GEOMETRY_COLUMN}, {TARGET_SRID})
+            """)
+        raw_conn.commit()
+    except Exception:
+        raw_conn.rollback()
+        raise
+    finally:
+        raw_conn.close()
+
+    report.elapsed = time.perf_counter() - start
+    print(
+        f"{table_name} 串流匯入完成，共 {report.row_count} 筆，"
+        f"耗時 {report.elapsed:.1f} 秒（{report.rows_per_second:.0f} 筆/秒）"
+    )
+    return report
+
+
+def resolve_srid(crs: str | None) -> int:
+    """
+    由來源 CRS 取得 EPSG 代碼；無法辨識時視為 WGS84
+    """
+    if not crs:
+        return TARGET_SRID
+    return CRS.from_user_input(crs).to_epsg() or TARGET_SRID
+
+
+def _create_table_sql(
+        table_name: str,
+        columns: list[str],
+        attr_fields: list[pa.Field],
+        srid: int
+) -> str:
+    col_defs = [
+        f'"{name}" {_pg_type(f.type)}' for name, f in zip(columns, attr_fields)
+    ]
+    col_defs.append(f"{GEOMETRY_COLUMN} geometry(Geometry, {srid})")
+    return f'CREATE TABLE "{table_name}" ({", ".join(col_defs)})'
+
+
+def _pg_type(arrow_type: pa.DataType) -> str:
+    """
+    Arrow 型別 ➜ PostgreSQL 型別
+    """
+    if pa.types.is_boolean(arrow_type):
+        return "BOOLEAN"
+    if pa.types.is_integer(arrow_type):
+        return "BIGINT"
+    if pa.types.is_floating(arrow_type):
+        return "DOUBLE PRECISION"
+    if pa.types.is_decimal(arrow_type):
+        return "NUMERIC"
+    if pa.types.is_date(arrow_type):
+        return "DATE"
+    if pa.types.is_timestamp(arrow_type):
+        return "TIMESTAMPTZ" if arrow_type.tz else "TIMESTAMP"
+    if pa.types.is_time(arrow_type):
+        return "TIME"
+    return "TEXT"
+
+
+def _batch_to_csv(
+        batch: pa.RecordBatch,
+        geom_name: str,
+        geoms,
+        srid: int
+) -> io.BytesIO:
+    """
+    將一批圖徵轉為 COPY 可讀的 CSV，幾何欄位為 hex EWKB
+    """
+    geoms = shapely.set_srid(geoms, srid)
+    geom_hex = shapely.to_wkb(geoms, hex=True, include_srid=True)
+
+    arrays = [
+        batch.column(i) for i, f in enumerate(batch.schema) if f.name != geom_name
+    ]
+    arrays.append(pa.array(geom_hex, type=pa.string()))
+    table = pa.Table.from_arrays(
+        arrays, names=[f"c{i}" for i in range(len(arrays))])
+
+    buffer = io.BytesIO()
+    pa_csv.write_csv(
+        table, buffer, write_options=pa_csv.WriteOptions(include_header=False)
+    )
+    buffer.seek(0)
+    return buffer
@@ -0,0 +1,7 @@
+# 🔧 所有要載入的地理資料（Enum 名稱 ➜ 檔案路徑）
+# 獨立成模組，讓不需要資料庫的程式（例如本地分區引擎）也能取得檔案路徑
+GEO_FILES = {
+    "TAIPEI_LANDUSE": "Input/zoning_regu.shp",
+    "TAIWAN_LANDUSE": "Input/zoning_fixed.gpkg",
+    "PUBLIC_LAND": "Input/land_public_fix.gpkg",
+}
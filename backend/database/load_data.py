@@ -1,60 +1,156 @@
 from enum import Enum
 import os
-import geopandas as gpd
+from sqlalchemy import inspect, text
 from database.connect import POSTGIS_ENGINE
+from database.copy_loader import copy_file_to_table
+from database.geo_files import GEO_FILES
+from database.snapshot import SnapshotWriter, snapshot_is_current, write_snapshot
+from database.spatial_index import build_subdivided_table, ensure_subdivided_table, index_table
+from database.manifest import (
+    ManifestEntry,
+    content_hash,
+    ensure_manifest_table,
+    get_manifest_entry,
+    save_manifest_entry,
+    source_stat,
+    update_source_stat,
+)
 import concurrent.futures
 
 
-# 🔧 所有要載入的地理資料（Enum 名稱 ➜ 檔案路徑）
-GEO_FILES = {
-    "TAIPEI_LANDUSE": "Input/zoning_regu.shp",
-    "TAIWAN_LANDUSE": "Input/zoning_fixed.gpkg",
-    "PUBLIC_LAND": "Input/land_public_fix.gpkg",
-}
+# 多個 worker 同時啟動時，只讓一個執行匯入，其餘等待後依紀錄略過
+_INGEST_LOCK_KEY = 20250601
 
 
 def load_data_into_db() -> Enum:
     """
-    平行讀取地理檔案並寫入資料庫，建立 DBTableName Enum（表名為小寫）
+    平行檢查地理檔案是否變更，僅重新匯入有變更的圖層，建立 DBTableName Enum（表名為小寫）
     """
     tables = {}
 
-    # 使用 ThreadPoolExecutor 進行平行處理
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        # 提交所有任務
-        future_to_enum = {
-            executor.submit(_insert_to_postgis, file_path, enum_name.lower()): enum_name
-            for enum_name, file_path in GEO_FILES.items()
-        }
-
-        # 收集結果
-        for future in concurrent.futures.as_completed(future_to_enum):
-            enum_name = future_to_enum[future]
-            try:
-                # 獲取結果（若有）
-                future.result()
-                tables[enum_name] = enum_name.lower()
-            except Exception as e:
-                print(f"處理 {enum_name} 時發生錯誤: {e}")
+    ensure_manifest_table(POSTGIS_ENGINE)
+
+    with POSTGIS_ENGINE.connect() as lock_conn:
+        lock_conn.execute(
+            text("SELECT pg_advisory_lock(:key)"), {"key": _INGEST_LOCK_KEY}
+        )
+        try:
+            # 使用 ThreadPoolExecutor 進行平行處理
+            with concurrent.futures.ThreadPoolExecutor() as executor:
+                # 提交所有任務
+                future_to_enum = {
+                    executor.submit(_sync_layer, file_path, enum_name.lower()): enum_name
+                    for enum_name, file_path in GEO_FILES.items()
+                }
+
+                # 收集結果
+                for future in concurrent.futures.as_completed(future_to_enum):
+                    enum_name = future_to_enum[future]
+                    try:
+                        # 獲取結果（若有）
+                        future.result()
+                        tables[enum_name] = enum_name.lower()
+                    except Exception as e:
+                        print(f"處理 {enum_name} 時發生錯誤: {e}")
+        finally:
+            lock_conn.execute(
+                text("SELECT pg_advisory_unlock(:key)"), {"key": _INGEST_LOCK_KEY}
+            )
 
     return Enum("DBTableName", tables)
 
 
-def _insert_to_postgis(file_path: str, table_name: str):
+def _sync_layer(file_path: str, table_name: str) -> bool:
     """
-    讀取地理檔案，欄位轉小寫，匯入 PostGIS
+    比對來源檔案與匯入紀錄，未變更則略過
+    :return: 是否有重新匯入
     """
+    entry = get_manifest_entry(POSTGIS_ENGINE, table_name)
+    table_exists = inspect(POSTGIS_ENGINE).has_table(table_name)
+
     if not os.path.exists(file_path):
+        if entry and table_exists:
+            # 來源檔不在（例如只部署程式碼），沿用資料庫中既有的資料表
+            print(f"{file_path} 不存在，沿用既有的 {table_name}")
+            ensure_subdivided_table(POSTGIS_ENGINE, table_name, entry.content_hash)
+            return False
         raise FileNotFoundError(f"{file_path} 不存在，請確認檔案路徑")
 
-    df = gpd.read_file(file_path)
-    df.columns = [col.lower() for col in df.columns]  # 欄位全小寫
-    df.to_postgis(
-        name=table_name,
-        con=POSTGIS_ENGINE,
-        if_exists="replace",
-        index=False,
+    stat = source_stat(file_path)
+    if entry and table_exists and entry.source_stat == stat:
+        print(f"{table_name} 來源未變更，略過匯入")
+        ensure_subdivided_table(POSTGIS_ENGINE, table_name, entry.content_hash)
+        _ensure_snapshot(file_path, table_name, stat, entry.content_hash)
+        return False
+
+    digest = content_hash(file_path)
+    if entry and table_exists and entry.content_hash == digest:
+        update_source_stat(POSTGIS_ENGINE, table_name, stat)
+        print(f"{table_name} 內容未變更，略過匯入")
+        ensure_subdivided_table(POSTGIS_ENGINE, table_name, digest)
+        _ensure_snapshot(file_path, table_name, stat, digest)
+        return False
+
+    _insert_to_postgis(file_path, table_name, stat, digest)
+    return True
+
+
+def _insert_to_postgis(file_path: str, table_name: str, stat: str, digest: str):
+    """
+    串流讀取地理檔案，以 COPY 匯入 PostGIS 暫存表並建好索引後再換表，
+    避免匯入期間正式資料表為空；最後重建切分表。
+    同一次讀取中一併寫出欄式快照，換表成功後才換上新快照
+    """
+    staging_name = f"{table_name}__staging"
+    snapshot = SnapshotWriter(table_name, stat, digest)
+
+    try:
+        report = copy_file_to_table(
+            POSTGIS_ENGINE, file_path, staging_name, batch_sinks=[snapshot])
+    except Exception:
+        snapshot.abort()
+        raise
+
+    entry = ManifestEntry(
+        layer=table_name,
+        source_path=file_path,
+        source_stat=stat,
+        content_hash=digest,
+        row_count=report.row_count,
+        schema=report.schema,
     )
 
+    try:
+        with POSTGIS_ENGINE.begin() as conn:
+            index_table(conn, staging_name, f"{staging_name}_geometry_gist")
+
+        with POSTGIS_ENGINE.begin() as conn:
+            conn.execute(text(f'DROP TABLE IF EXISTS "{table_name}"'))
+            conn.execute(text(f'ALTER TABLE "{staging_name}" RENAME TO "{table_name}"'))
+            conn.execute(text(
+                f'ALTER INDEX "{staging_name}_geometry_gist" RENAME TO "{table_name}_geometry_gist"'
+            ))
+            save_manifest_entry(conn, entry)
+    except Exception:
+        snapshot.abort()
+        raise
+
+    snapshot.commit()
+    print(f"{table_name} 換表完成，共 {entry.row_count} 筆")
+
+    build_subdivided_table(POSTGIS_ENGINE, table_name, digest)
+
+
+def _ensure_snapshot(file_path: str, table_name: str, stat: str, digest: str) -> None:
+    """
+    資料表未變更時，補寫缺少或過期的快照；快照失敗不影響資料庫匯入
+    """
+    if snapshot_is_current(table_name, stat, digest):
+        return
+    try:
+        write_snapshot(file_path, table_name, stat, digest)
+    except Exception as e:
+        print(f"{table_name} 快照寫入失敗: {e}")
+
 
 DBTableName = load_data_into_db()
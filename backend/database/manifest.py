@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from typing import Optional
+from sqlalchemy import Engine, text
+
+
+MANIFEST_TABLE = "ingest_manifest"
+
+# Shapefile 由多個附屬檔組成，任何一個變動都視為來源變更
+_SHAPEFILE_SIDECARS = (".shp", ".shx", ".dbf", ".prj", ".cpg")
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class ManifestEntry:
+    """
+    單一圖層的匯入紀錄
+    """
+    layer: str
+    source_path: str
+    source_stat: str  # 檔案大小與修改時間，用於快速判斷是否需重新計算雜湊
+    content_hash: str
+    row_count: int
+    schema: dict
+
+
+def ensure_manifest_table(engine: Engine) -> None:
+    """
+    建立匯入紀錄表（若不存在）
+    """
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {MANIFEST_TABLE} (
+                layer TEXT PRIMARY KEY,
+                source_path TEXT NOT NULL,
+                source_stat TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                row_count BIGINT NOT NULL,
+                schema JSONB NOT NULL,
+                ingested_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+        """))
+
+
+def source_files(file_path: str) -> list[str]:
+    """
+    取得組成該圖層的所有實體檔案（shapefile 含附屬檔）
+    """
+    stem, ext = os.path.splitext(file_path)
+    if ext.lower() != ".shp":
+        return [file_path]
+    return [
+        stem + sidecar for sidecar in _SHAPEFILE_SIDECARS
+        if os.path.exists(stem + sidecar)
+    ]
+
+
+def source_stat(file_path: str) -> str:
+    """
+    以檔案大小與修改時間組成的簽章，成本極低，僅作為快速判斷
+    """
+    parts = []
+    for path in source_files(file_path):
+        st = os.stat(path)
+        parts.append(f"{os.path.basename(path)}:{st.st_size}:{st.st_mtime_ns}")
+    return "|".join(parts)
+
+
+def content_hash(file_path: str) -> str:
+    """
+    串流計算來源檔案內容的 SHA-256（不會一次讀入整個檔案）
+    """
+    digest = hashlib.sha256()
+    for path in source_files(file_path):
+        digest.update(os.path.basename(path).encode("utf-8"))
+        with open(path, "rb") as f:
+            while chunk := f.read(_HASH_CHUNK_SIZE):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+# 指定圖層目前資料內容的版本，任一圖層重新匯入後即改變
+DATA_VERSION_SQL = text(f"""
+    SELECT md5(string_agg(content_hash, ',' ORDER BY layer))
+    FROM {MANIFEST_TABLE}
+    WHERE layer = ANY(CAST(:layers AS TEXT[]))
+""")
+
+
+def get_manifest_entry(engine: Engine, layer: str) -> Optional[ManifestEntry]:
+    with engine.connect() as conn:
+        row = conn.execute(
+            text(f"""
+                SELECT layer, source_path, source_stat, content_hash, row_count, schema
+                FROM {MANIFEST_TABLE}
+                WHERE layer = :layer
+            """),
+            {"layer": layer},
+        ).mappings().first()
+    if not row:
+        return None
+    return ManifestEntry(**row)
+
+
+def save_manifest_entry(conn, entry: ManifestEntry) -> None:
+    """
+    寫入（或更新）匯入紀錄；需在呼叫端的交易中執行，以便與換表一起生效
+    """
+    conn.execute(
+        text(f"""
+            INSERT INTO {MANIFEST_TABLE}
+                (layer, source_path, source_stat, content_hash, row_count, schema, ingested_at)
+            VALUES
+                (:layer, :source_path, :source_stat, :content_hash, :row_count, CAST(:schema AS JSONB), now())
+            ON CONFLICT (layer) DO UPDATE SET
+                source_path = EXCLUDED.source_path,
+                source_stat = EXCLUDED.source_stat,
+                content_hash = EXCLUDED.content_hash,
+                row_count = EXCLUDED.row_count,
+                schema = EXCLUDED.schema,
+                ingested_at = EXCLUDED.ingested_at
+        """),
+        {
+            "layer": entry.layer,
+            "source_path": entry.source_path,
+            "source_stat": entry.source_stat,
+            "content_hash": entry.content_hash,
+            "row_count": entry.row_count,
+            "schema": json.dumps(entry.schema, ensure_ascii=False),
+        },
+    )
+
+
+def update_source_stat(engine: Engine, layer: str, stat: str) -> None:
+    """
+    內容未變但檔案時間戳改變時（例如重新複製檔案），只更新簽章
+    """
+    with engine.begin() as conn:
+        conn.execute(
+            text(f"UPDATE {MANIFEST_TABLE} SET source_stat = :stat WHERE layer = :layer"),
+            {"layer": layer, "stat": stat},
+        )
@@ -0,0 +1,193 @@
+import os
+import re
+import time
+import urllib.request
+import geopandas as gpd
+import pandas as pd
+from pyogrio import read_dataframe
+from sqlalchemy import inspect, text
+
+from database.connect import POSTGIS_ENGINE
+from database.copy_loader import copy_frame_to_table
+from database.manifest import (
+    ManifestEntry,
+    content_hash,
+    ensure_manifest_table,
+    get_manifest_entry,
+    save_manifest_entry,
+    source_stat,
+    update_source_stat,
+)
+from database.spatial_index import index_table
+
+
+OSM_POI_TABLE = "osm_poi"
+POI_COLUMNS = ["poi_type", "name", "addr:full", "addr:city", "addr:district"]
+
+# 與 load_data 的匯入鎖不同，避免 POI 更新阻擋分區圖層匯入
+_POI_LOCK_KEY = 20250602
+
+# OGR OSM driver 將未列為欄位的標籤放在 other_tags："key"=>"value","key2"=>"value2"
+_OTHER_TAGS = re.compile(r'"((?:[^"\\]|\\.)*)"=>"((?:[^"\\]|\\.)*)"')
+
+
+def read_osm_poi(pbf_path: str, amenity_category: dict[str, str]) -> gpd.GeoDataFrame:
+    """
+    由 .osm.pbf 讀取 amenity POI 並分類；面狀設施以代表點表示
+    :param pbf_path: OSM extract 檔案
+    :param amenity_category: amenity 標籤 ➜ POI 類別
+    :return: POI_COLUMNS + geometry（EPSG:4326）
+    """
+    frames = []
+    for layer, where in (
+        ("points", "other_tags LIKE '%\"amenity\"=>%'"),
+        ("multipolygons", "amenity IS NOT NULL"),
+    ):
+        df = read_dataframe(pbf_path, layer=layer, where=where)
+        if df.empty:
+            continue
+        tags = df["other_tags"].map(_parse_other_tags) if "other_tags" in df.columns \
+            else pd.Series([{}] * len(df), index=df.index)
+        amenity = df["amenity"] if "amenity" in df.columns \
+            else tags.map(lambda t: t.get("amenity"))
+
+        poi = gpd.GeoDataFrame({
+            "poi_type": amenity.map(amenity_category),
+            "name": df["name"],
+            **{
+                col: tags.map(lambda t, key=col: t.get(key))
+                for col in POI_COLUMNS[2:]
+            },
+        }, geometry=df.geometry.representative_point(), crs=df.crs)
+        frames.append(poi)
+
+    if not frames:
+        return gpd.GeoDataFrame(columns=POI_COLUMNS + ["geometry"], crs="EPSG:4326")
+    poi = gpd.GeoDataFrame(pd.concat(frames, ignore_index=True), crs=frames[0].crs)
+    poi = poi.dropna(subset=["poi_type", "name"])
+    if poi.crs is not None and poi.crs.to_epsg() != 4326:
+        poi = poi.to_crs(epsg=4326)
+    return poi.reset_index(drop=True)
+
+
+def refresh_osm_poi(
+        pbf_path: str,
+        amenity_category: dict[str, str],
+        url: str = "",
+        max_age_seconds: float = 86400
+) -> bool:
+    """
+    更新本地 POI 資料表：必要時重新下載 extract，內容有變更才重新匯入。
+    多個 worker 同時呼叫時以 advisory lock 排隊，後到者依匯入紀錄略過。
+    :param url: extract 下載網址；未設定則只使用現有檔案
+    :param max_age_seconds: 檔案超過此秒數才重新下載
+    :return: 是否有重新匯入
+    """
+    ensure_manifest_table(POSTGIS_ENGINE)
+
+    with POSTGIS_ENGINE.connect() as lock_conn:
+        lock_conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": _POI_LOCK_KEY})
+        try:
+            if url and _is_stale(pbf_path, max_age_seconds):
+                try:
+                    _download(url, pbf_path)
+                except Exception as e:
+                    # 下載失敗時沿用現有檔案
+                    print(f"下載 {url} 失敗: {e}")
+            return _sync_osm_poi(pbf_path, amenity_category)
+        finally:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _POI_LOCK_KEY})
+
+
+def _sync_osm_poi(pbf_path: str, amenity_category: dict[str, str]) -> bool:
+    entry = get_manifest_entry(POSTGIS_ENGINE, OSM_POI_TABLE)
+    table_exists = inspect(POSTGIS_ENGINE).has_table(OSM_POI_TABLE)
+
+    if not os.path.exists(pbf_path):
+        if entry and table_exists:
+            print(f"{pbf_path} 不存在，沿用既有的 {OSM_POI_TABLE}")
+            return False
+        raise FileNotFoundError(f"{pbf_path} 不存在，請確認檔案路徑")
+
+    stat = source_stat(pbf_path)
+    if entry and table_exists and entry.source_stat == stat:
+        return False
+
+    digest = content_hash(pbf_path)
+    if entry and table_exists and entry.content_hash == digest:
+        update_source_stat(POSTGIS_ENGINE, OSM_POI_TABLE, stat)
+        return False
+
+    start = time.perf_counter()
+    poi = read_osm_poi(pbf_path, amenity_category)
+    print(f"OSM POI 讀取完成，共 {len(poi)} 筆，耗時 {time.perf_counter() - start:.1f} 秒")
+
+    staging_name = f"{OSM_POI_TABLE}__staging"
+    report = copy_frame_to_table(POSTGIS_ENGINE, poi, staging_name)
+
+    with POSTGIS_ENGINE.begin() as conn:
+        index_table(conn, staging_name, f"{staging_name}_geometry_gist")
+        # 半徑查詢與 KNN 排序以 geography 計算，需另建對應的運算式索引
+        conn.execute(text(f"""
+            CREATE INDEX "{staging_name}_geography_gist"
+            ON "{staging_name}" USING GIST (CAST(geometry AS geography))
+        """))
+
+    with POSTGIS_ENGINE.begin() as conn:
+        conn.execute(text(f'DROP TABLE IF EXISTS "{OSM_POI_TABLE}"'))
+        conn.execute(text(f'ALTER TABLE "{staging_name}" RENAME TO "{OSM_POI_TABLE}"'))
+        for suffix in ("geometry_gist", "geography_gist"):
+            conn.execute(text(
+                f'ALTER INDEX "{staging_name}_{suffix}" RENAME TO "{OSM_POI_TABLE}_{suffix}"'
+            ))
+        save_manifest_entry(conn, ManifestEntry(
+            layer=OSM_POI_TABLE,
+            source_path=pbf_path,
+            source_stat=stat,
+            content_hash=digest,
+            row_count=report.row_count,
+            schema=report.schema,
+        ))
+
+    print(f"{OSM_POI_TABLE} 換表完成，共 {report.row_count} 筆")
+    return True
+
+
+def _parse_other_tags(value) -> dict[str, str]:
+    if not isinstance(value, str):
+        return {}
+    return {
+        key.replace('\\"', '"'): val.replace('\\"', '"')
+        for key, val in _OTHER_TAGS.findall(value)
+    }
+
+
+def _is_stale(path: str, max_age_seconds: float) -> bool:
+    return not os.path.exists(path) or time.time() - os.path.getmtime(path) > max_age_seconds
+
+
+def _download(url: str, path: str) -> None:
+    """
+    下載至暫存檔後再換上，避免讀到下載到一半的檔案
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".download"
+    start = time.perf_counter()
+    urllib.request.urlretrieve(url, tmp_path)
+    os.replace(tmp_path, path)
+    print(f"已下載 {url}，耗時 {time.perf_counter() - start:.1f} 秒")
+
+
+if __name__ == "__main__":
+    # 手動匯入或更新本地 POI 資料表；於 backend 目錄下執行：python -m database.osm_poi
+    from config.consts import POI_PBF_PATH, POI_PBF_URL, POI_REFRESH_SECONDS
+    from services.poi import POI_TYPES
+
+    refresh_osm_poi(
+        POI_PBF_PATH,
+        {amenity: category for category, amenities in POI_TYPES.items() for amenity in amenities},
+        POI_PBF_URL,
+        POI_REFRESH_SECONDS,
+    )
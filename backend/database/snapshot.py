@@ -0,0 +1,207 @@
+import json
+import os
+from typing import Optional
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import shapely
+from pyogrio import open_arrow
+from pyproj import Transformer
+
+from database.copy_loader import DEFAULT_BATCH_SIZE, TARGET_SRID, resolve_srid
+from database.manifest import source_stat
+
+
+# 每個圖層的欄式快照：
+# - <layer>.parquet：GeoParquet（WKB + bbox covering），壓縮後體積小，供其他工具使用
+# - <layer>.arrow：未壓縮的 Arrow IPC，worker 以 memory map 開啟，多個程序共用同一份頁面
+SNAPSHOT_DIR = os.path.join("cache", "snapshots")
+
+GEOMETRY_COLUMN = "geometry"
+BBOX_COLUMN = "bbox"
+
+_META_SOURCE_STAT = b"neighborgis:source_stat"
+_META_CONTENT_HASH = b"neighborgis:content_hash"
+
+_BBOX_TYPE = pa.struct([
+    ("xmin", pa.float64()),
+    ("ymin", pa.float64()),
+    ("xmax", pa.float64()),
+    ("ymax", pa.float64()),
+])
+
+# GeoParquet 1.1 中繼資料；未指定 crs 即為 OGC:CRS84（經度、緯度）
+_GEO_METADATA = json.dumps({
+    "version": "1.1.0",
+    "primary_column": GEOMETRY_COLUMN,
+    "columns": {
+        GEOMETRY_COLUMN: {
+            "encoding": "WKB",
+            "geometry_types": [],
+            "covering": {
+                "bbox": {
+                    key: [BBOX_COLUMN, key] for key in ("xmin", "ymin", "xmax", "ymax")
+                },
+            },
+        },
+    },
+}).encode("utf-8")
+
+
+def snapshot_paths(layer: str) -> tuple[str, str]:
+    """
+    :return: (GeoParquet 路徑, Arrow IPC 路徑)
+    """
+    base = os.path.join(SNAPSHOT_DIR, layer)
+    return f"{base}.parquet", f"{base}.arrow"
+
+
+class SnapshotWriter:
+    """
+    逐批寫入圖層快照；先寫暫存檔，commit 時才換上，避免 worker 讀到寫一半的檔案
+    """
+
+    def __init__(self, layer: str, stat: str, digest: str):
+        self.parquet_path, self.arrow_path = snapshot_paths(layer)
+        self._metadata = {
+            b"geo": _GEO_METADATA,
+            _META_SOURCE_STAT: stat.encode("utf-8"),
+            _META_CONTENT_HASH: digest.encode("utf-8"),
+        }
+        self._parquet_writer: pq.ParquetWriter = None
+        self._arrow_writer: pa.RecordBatchFileWriter = None
+        self._arrow_sink: pa.NativeFile = None
+        self._transformers: dict[int, Transformer] = {}
+
+    def write_batch(
+            self,
+            batch: pa.RecordBatch,
+            geom_name: str,
+            geoms: np.ndarray,
+            srid: int
+    ) -> None:
+        """
+        :param batch: 原始 Arrow 批次
+        :param geom_name: 批次中的幾何欄位名稱
+        :param geoms: 已解碼的幾何（來源座標系）
+        :param srid: 來源座標系
+        """
+        if srid != TARGET_SRID:
+            geoms = self._to_wgs84(geoms, srid)
+        bounds = shapely.bounds(geoms)
+
+        names = [f.name.lower() for f in batch.schema if f.name != geom_name]  # 欄位全小寫
+        arrays = [
+            batch.column(i) for i, f in enumerate(batch.schema) if f.name != geom_name
+        ]
+        names += [GEOMETRY_COLUMN, BBOX_COLUMN]
+        arrays += [
+            pa.array(shapely.to_wkb(geoms), type=pa.binary()),
+            pa.StructArray.from_arrays(
+                [pa.array(bounds[:, i]) for i in range(4)],
+                fields=list(_BBOX_TYPE),
+            ),
+        ]
+        table = pa.Table.from_arrays(arrays, names=names)
+
+        if self._parquet_writer is None:
+            os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+            schema = table.schema.with_metadata(self._metadata)
+            self._parquet_writer = pq.ParquetWriter(
+                self.parquet_path + ".tmp", schema, compression="zstd")
+            self._arrow_sink = pa.OSFile(self.arrow_path + ".tmp", "wb")
+            self._arrow_writer = pa.ipc.new_file(self._arrow_sink, schema)
+
+        table = table.replace_schema_metadata(self._metadata)
+        self._parquet_writer.write_table(table)
+        self._arrow_writer.write_table(table)
+
+    def commit(self) -> None:
+        if self._parquet_writer is None:
+            return
+        self._close()
+        os.replace(self.parquet_path + ".tmp", self.parquet_path)
+        os.replace(self.arrow_path + ".tmp", self.arrow_path)
+
+    def abort(self) -> None:
+        if self._parquet_writer is None:
+            return
+        self._close()
+        for path in (self.parquet_path + ".tmp", self.arrow_path + ".tmp"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _close(self) -> None:
+        self._parquet_writer.close()
+        self._arrow_writer.close()
+        self._arrow_sink.close()
+
+    def _to_wgs84(self, geoms: np.ndarray, srid: int) -> np.ndarray:
+        transformer = self._transformers.get(srid)
+        if transformer is None:
+            transformer = Transformer.from_crs(srid, TARGET_SRID, always_xy=True)
+            self._transformers[srid] = transformer
+        return shapely.transform(
+            geoms,
+            lambda coords: np.column_stack(
+                transformer.transform(coords[:, 0], coords[:, 1])),
+        )
+
+
+def write_snapshot(
+        file_path: str,
+        layer: str,
+        stat: str,
+        digest: str,
+        batch_size: int = DEFAULT_BATCH_SIZE
+) -> None:
+    """
+    直接由來源檔案寫出快照（資料表未變更、只缺快照或快照過期時使用）
+    """
+    writer = SnapshotWriter(layer, stat, digest)
+    try:
+        with open_arrow(file_path, batch_size=batch_size, use_pyarrow=True) as source:
+            meta, reader = source
+            geom_name = meta["geometry_name"] or "wkb_geometry"
+            srid = resolve_srid(meta["crs"])
+            for batch in reader:
+                geoms = shapely.from_wkb(batch.column(geom_name))
+                writer.write_batch(batch, geom_name, geoms, srid)
+    except Exception:
+        writer.abort()
+        raise
+    writer.commit()
+    print(f"{layer} 快照寫入完成")
+
+
+def snapshot_is_current(layer: str, stat: str, digest: str) -> bool:
+    """
+    快照是否存在且與來源內容、檔案簽章一致
+    （worker 只比對檔案簽章，因此簽章改變時也需重寫快照）
+    """
+    parquet_path, arrow_path = snapshot_paths(layer)
+    if not (os.path.exists(parquet_path) and os.path.exists(arrow_path)):
+        return False
+    metadata = pq.read_schema(parquet_path).metadata or {}
+    return (
+        metadata.get(_META_CONTENT_HASH) == digest.encode("utf-8")
+        and metadata.get(_META_SOURCE_STAT) == stat.encode("utf-8")
+    )
+
+
+def open_snapshot(layer: str, file_path: str = None) -> Optional[pa.Table]:
+    """
+    以 memory map 開啟圖層的 Arrow 快照（零複製，讀取的頁面由多個程序共用）
+    :param file_path: 來源檔案；若存在且檔案簽章與快照不符，視為過期
+    :return: Arrow Table，快照不存在或過期時回傳 None
+    """
+    _, arrow_path = snapshot_paths(layer)
+    if not os.path.exists(arrow_path):
+        return None
+
+    reader = pa.ipc.open_file(pa.memory_map(arrow_path, "r"))
+    if file_path and os.path.exists(file_path):
+        metadata = reader.schema.metadata or {}
+        if metadata.get(_META_SOURCE_STAT) != source_stat(file_path).encode("utf-8"):
+            return None
+    return reader.read_all()
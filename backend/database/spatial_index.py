@@ -0,0 +1,146 @@
+import statistics
+import time
+from sqlalchemy import Connection, Engine, inspect, text
+
+
+# ST_Subdivide 每個子多邊形的頂點上限；越小則單次包含判斷越快，但列數越多
+SUBDIVIDE_MAX_VERTICES = 256
+
+
+def subdivided_table_name(table_name: str) -> str:
+    return f"{table_name}_subdivided"
+
+
+def index_table(conn: Connection, table_name: str, index_name: str = None) -> None:
+    """
+    建立幾何欄位的 GiST 索引並更新統計資訊
+    :param conn: 需在交易中的連線
+    :param table_name: 資料表
+    :param index_name: 索引名稱（預設為 <table>_geometry_gist）
+    """
+    index_name = index_name or f"{table_name}_geometry_gist"
+    conn.execute(text(
+        f'CREATE INDEX IF NOT EXISTS "{index_name}" '
+        f'ON "{table_name}" USING GIST (geometry)'
+    ))
+    conn.execute(text(f'ANALYZE "{table_name}"'))
+
+
+def build_subdivided_table(engine: Engine, table_name: str, source_hash: str) -> int:
+    """
+    以 ST_Subdivide 將頂點繁多的多邊形切成小塊，建立 <table>_subdivided，
+    先寫入暫存表並建好索引後再換表，查詢端不會看到未完成的資料表
+    :param source_hash: 來源內容雜湊，記錄於資料表註解，用來判斷切分表是否過期
+    :return: 切分後的列數
+    """
+    target = subdivided_table_name(table_name)
+    staging = f"{target}__staging"
+    attr_columns = ", ".join(
+        f'"{col["name"]}"'
+        for col in inspect(engine).get_columns(table_name)
+        if col["name"] != "geometry"
+    )
+    select_attrs = f"{attr_columns}, " if attr_columns else ""
+
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(text(f'DROP TABLE IF EXISTS "{staging}"'))
+        # 無效多邊形會讓 ST_Subdivide 失敗，先修正再切分
+        conn.execute(text(f"""
+            CREATE TABLE "{staging}" AS
+            SELECT {select_attrs}ST_Subdivide(
+                CASE WHEN ST_IsValid(geometry) THEN geometry ELSE ST_MakeValid(geometry) END,
+                {SUBDIVIDE_MAX_VERTICES}
+            ) AS geometry
+            FROM "{table_name}"
+            WHERE geometry IS NOT NULL
+        """))
+        index_table(conn, staging, f"{staging}_geometry_gist")
+        row_count = conn.execute(
+            text(f'SELECT count(*) FROM "{staging}"')).scalar()
+
+        conn.execute(text(f'DROP TABLE IF EXISTS "{target}"'))
+        conn.execute(text(f'ALTER TABLE "{staging}" RENAME TO "{target}"'))
+        conn.execute(text(
+            f'ALTER INDEX "{staging}_geometry_gist" RENAME TO "{target}_geometry_gist"'
+        ))
+        conn.execute(text(f"COMMENT ON TABLE \"{target}\" IS '{source_hash}'"))
+
+    print(
+        f"{target} 建立完成，共 {row_count} 筆，"
+        f"耗時 {time.perf_counter() - start:.1f} 秒"
+    )
+    return row_count
+
+
+def ensure_subdivided_table(engine: Engine, table_name: str, source_hash: str) -> None:
+    """
+    切分表不存在或與來源內容不符（例如升級前已匯入、或上次切分中斷）時補建
+    """
+    target = subdivided_table_name(table_name)
+    if inspect(engine).has_table(target):
+        with engine.connect() as conn:
+            built_from = conn.execute(
+                text("SELECT obj_description(CAST(:t AS regclass), 'pg_class')"),
+                {"t": f'"{target}"'},
+            ).scalar()
+        if built_from == source_hash:
+            return
+    with engine.begin() as conn:
+        index_table(conn, table_name)
+    build_subdivided_table(engine, table_name, source_hash)
+
+
+def benchmark_lookups(engine: Engine, table_name: str, samples: int = 500) -> dict:
+    """
+    比較原始資料表（ST_Within）與切分表（ST_Intersects）的單點查詢延遲
+    :return: {"original": (p50, p99), "subdivided": (p50, p99)}，單位毫秒
+    """
+    with engine.connect() as conn:
+        points = conn.execute(text(f"""
+            SELECT ST_X(pt) AS lng, ST_Y(pt) AS lat
+            FROM (
+                SELECT ST_PointOnSurface(geometry) AS pt
+                FROM "{table_name}"
+                WHERE geometry IS NOT NULL
+                ORDER BY random()
+                LIMIT :samples
+            ) s
+        """), {"samples": samples}).all()
+
+    queries = {
+        "original": f"""
+            SELECT 1 FROM "{table_name}"
+            WHERE ST_Within(ST_SetSRID(ST_MakePoint(:lng, :lat), 4326), geometry)
+            LIMIT 1
+        """,
+        "subdivided": f"""
+            SELECT 1 FROM "{subdivided_table_name(table_name)}"
+            WHERE ST_Intersects(geometry, ST_SetSRID(ST_MakePoint(:lng, :lat), 4326))
+            LIMIT 1
+        """,
+    }
+
+    results = {}
+    with engine.connect() as conn:
+        for label, sql in queries.items():
+            stmt = text(sql)
+            latencies = []
+            for lng, lat in points:
+                t0 = time.perf_counter()
+                conn.execute(stmt, {"lng": lng, "lat": lat}).first()
+                latencies.append((time.perf_counter() - t0) * 1000)
+            cuts = statistics.quantiles(latencies, n=100)
+            results[label] = (cuts[49], cuts[98])
+    return results
+
+
+if __name__ == "__main__":
+    # 於 backend 目錄下執行：python -m database.spatial_index
+    from database.connect import POSTGIS_ENGINE
+    from database.load_data import DBTableName
+
+    for table in DBTableName:
+        res = benchmark_lookups(POSTGIS_ENGINE, table.value)
+        for label, (p50, p99) in res.items():
+            print(f"{table.value:<16} {label:<11} p50={p50:.2f}ms p99={p99:.2f}ms")
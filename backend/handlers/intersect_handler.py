@@ -1,10 +1,12 @@
-import asyncio
 from dataclasses import asdict
 from fastapi import Request
 from fastapi.responses import JSONResponse
 from services import geocoding, intersect
 from structs.adress_point import Coordinates, AddressPoint
 from structs.api_response import APIResponse
+from structs.intersect_batch import IntersectBatchItem
+
+MAX_BATCH_SIZE = 1000  # 單次批次查詢的最大筆數
 
 
 async def get_intersect_handler(request: Request, x: str) -> JSONResponse:
@@ -12,8 +14,15 @@ async def get_intersect_handler(request: Request, x: str) -> JSONResponse:
     address: str = None
     coordinates: Coordinates = None
     if str(use_coordinates).lower() != "true":
-        coordinates: Coordinates = await asyncio.to_thread(geocoding.arcgis_geocode, x)
+        coordinates: Coordinates = await geocoding.geocode_async(x)
         address = x
+        if coordinates is None or coordinates.lat is None or coordinates.lng is None:
+            return JSONResponse(
+                status_code=404,
+                content=asdict(APIResponse(
+                    message="無法找到該地址，請檢查地址是否正確。"
+                ))
+            )
     else:
         lat = float(x.split(",")[0])
         lng = float(x.split(",")[1])
@@ -44,3 +53,92 @@ async def get_intersect_handler(request: Request, x: str) -> JSONResponse:
             data=address_point
         ))
     )
+
+
+async def post_intersect_batch_handler(request: Request) -> JSONResponse:
+    """
+    批次查詢多個地址或座標的使用分區
+    請求格式：{"items": ["地址", {"address": "地址"}, {"lat": 25.03, "lng": 121.56}, ...]}
+    每筆各自回報錯誤，不會因單筆失敗而整批失敗
+    """
+    req_json = await request.json()
+    items = req_json.get("items") if isinstance(req_json, dict) else None
+    if not isinstance(items, list) or not items:
+        return JSONResponse(
+            status_code=400,
+            content=asdict(APIResponse(
+                message="請提供要查詢的地址或座標列表（items）。"
+            ))
+        )
+    if len(items) > MAX_BATCH_SIZE:
+        return JSONResponse(
+            status_code=400,
+            content=asdict(APIResponse(
+                message=f"單次最多查詢 {MAX_BATCH_SIZE} 筆。"
+            ))
+        )
+
+    results = [_parse_batch_item(item) for item in items]
+
+    # 地址需先轉為座標
+    to_geocode = [
+        r for r in results
+        if r.error is None and r.coordinates is None
+    ]
+    async for i, coordinates in geocoding.geocode_many([r.address for r in to_geocode]):
+        r = to_geocode[i]
+        if coordinates is None:
+            r.error = "無法找到該地址，請檢查地址是否正確。"
+        elif coordinates.lat is None or coordinates.lng is None:
+            r.error = "地理編碼失敗，請稍後再試。"
+        else:
+            r.coordinates = coordinates
+
+    # 所有有效座標在同一次查詢中完成
+    resolved = [r for r in results if r.error is None]
+    try:
+        zonings = await intersect.intersect_many([r.coordinates for r in resolved])
+    except Exception as e:
+        print(f"批次查詢使用分區時發生錯誤: {e}")
+        return JSONResponse(
+            status_code=500,
+            content=asdict(APIResponse(
+                message="批次查詢使用分區失敗，請稍後再試。"
+            ))
+        )
+    for r, zoning in zip(resolved, zonings):
+        r.zoning = zoning
+
+    return JSONResponse(
+        status_code=200,
+        content=asdict(APIResponse(
+            data=results
+        ))
+    )
+
+
+def _parse_batch_item(item) -> IntersectBatchItem:
+    """
+    將單筆輸入轉為 IntersectBatchItem，格式錯誤時記錄於 error
+    """
+    if isinstance(item, str):
+        item = {"address": item}
+    if not isinstance(item, dict):
+        return IntersectBatchItem(error="格式錯誤，需為地址字串或包含 address / lat、lng 的物件。")
+
+    if item.get("lat") is not None and item.get("lng") is not None:
+        try:
+            lat, lng = float(item["lat"]), float(item["lng"])
+        except (TypeError, ValueError):
+            return IntersectBatchItem(error="座標格式錯誤。")
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            return IntersectBatchItem(error="座標超出範圍。")
+        return IntersectBatchItem(
+            address=item.get("address"),
+            coordinates=Coordinates(lat=lat, lng=lng),
+        )
+
+    address = item.get("address")
+    if not isinstance(address, str) or not address.strip():
+        return IntersectBatchItem(error="缺少地址或座標。")
+    return IntersectBatchItem(address=address.strip())
@@ -0,0 +1,33 @@
+from fastapi.responses import JSONResponse
+from dataclasses import asdict
+
+from llm.llm import LLM_METRICS
+from llm.store import LLM_STORE
+from services.gazetteer import gazetteer_stats
+from services.geocoding import geocode_stats
+from services.intersect import ZONING_CACHE
+from services.poi import POI_TILE_CACHE
+from services.walk_network import WALK_GRAPH_CACHE
+from structs.api_response import APIResponse
+from utils.cache import smart_cache_stats
+
+
+async def get_metrics_handler() -> JSONResponse:
+    """
+    回傳各快取的命中率等執行狀態
+    """
+    return JSONResponse(
+        status_code=200,
+        content=asdict(APIResponse(
+            data={
+                "zoning_cache": ZONING_CACHE.stats(),
+                "geocode": geocode_stats(),
+                "gazetteer": gazetteer_stats(),
+                "poi_tile_cache": POI_TILE_CACHE.stats(),
+                "walk_graph_cache": WALK_GRAPH_CACHE.stats(),
+                "llm": LLM_METRICS.stats(),
+                "smart_cache": smart_cache_stats(),
+                "llm_store": LLM_STORE.stats(),
+            }
+        ))
+    )
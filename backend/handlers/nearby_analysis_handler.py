@@ -1,9 +1,11 @@
 from fastapi import Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from dataclasses import asdict
 
-from services.nearby_analysis import llm_nearby_analysis
+from services.nearby_analysis import llm_nearby_analysis, stream_nearby_analysis
 from structs.api_response import APIResponse
+from utils.disconnect import ClientDisconnectedError, cancel_on_disconnect
+from utils.sse import SSE_HEADERS, sse_event
 
 
 async def post_nearby_analysis_handler(request: Request) -> JSONResponse:
@@ -16,7 +18,17 @@ async def post_nearby_analysis_handler(request: Request) -> JSONResponse:
     data = await request.json()
     result: (dict | None) = None
     try:
-        result = await llm_nearby_analysis(data)
+        result = await cancel_on_disconnect(request, llm_nearby_analysis(data))
+    except ClientDisconnectedError:
+        # 使用者已離開，回應不會被讀取
+        return JSONResponse(status_code=499, content=asdict(APIResponse(message="請求已取消。")))
+    except TimeoutError as e:
+        return JSONResponse(
+            status_code=504,
+            content=asdict(APIResponse(
+                message=f"附近環境分析逾時。{str(e)}",
+            ))
+        )
     except Exception as e:
         return JSONResponse(
             status_code=500,
@@ -31,3 +43,25 @@ async def post_nearby_analysis_handler(request: Request) -> JSONResponse:
             data=result
         ))
     )
+
+
+async def post_nearby_analysis_stream_handler(request: Request) -> StreamingResponse:
+    """
+    串流版的鄰近分析（server-sent events）：
+    每個 poi_type 的分析一完成就送出 analysis 事件，最後送出 result 事件（完整結果）；
+    失敗時送出 error 事件。使用者中斷連線時會一併中止 LLM 生成。
+    :param request: FastAPI請求對象
+    :return: StreamingResponse
+    """
+    data = await request.json()
+
+    async def events():
+        try:
+            async for event, payload in stream_nearby_analysis(data):
+                yield sse_event(event, payload)
+        except TimeoutError as e:
+            yield sse_event("error", asdict(APIResponse(message=f"附近環境分析逾時。{str(e)}")))
+        except Exception as e:
+            yield sse_event("error", asdict(APIResponse(message=f"附近環境分析失敗。{str(e)}")))
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
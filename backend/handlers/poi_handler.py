@@ -1,16 +1,47 @@
 import geopandas as gpd
-from fastapi.responses import JSONResponse
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
 from dataclasses import asdict
-import json
 
+from config.consts import (
+    GEOJSON_PRECISION,
+    POI_CLUSTER_CELL_PX,
+    POI_CLUSTER_MAX_ZOOM,
+    WALK_MAX_MINUTES,
+    WALK_SPEED_M_PER_MIN,
+)
 from structs.api_response import APIResponse
 from structs.adress_point import Coordinates
-from services.poi import get_nearby_poi
+from structs.poi_rings import NearbyPoiRings
+from services.poi import POI_TYPES, get_nearby_poi
+from services.poi_cluster import cluster_pois
+from services.poi_rings import compute_ring_stats
+from services.walk_network import walk_access
+from utils import geojson
 
+DEFAULT_RING_RADII = [300, 500, 1000]  # 與 R 原型相同的環域範圍（公尺）
+MAX_RING_RADIUS = 2000
+MAX_RING_COUNT = 5
+DEFAULT_WALK_MINUTES = [5, 10, 15]
 
-async def get_nearby_poi_handler(coordinates: str) -> JSONResponse:
-    latitude, longitude = coordinates.split(",")
-    lat, lng = float(latitude), float(longitude)
+
+async def get_nearby_poi_handler(request: Request, coordinates: str) -> Response:
+    """
+    查詢參數：format=columnar 時回傳欄式精簡格式（見 utils/geojson.py），預設為 GeoJSON；
+    zoom 不大於 POI_CLUSTER_MAX_ZOOM 時依類別聚合為群集（cluster=false 可停用），
+    群集圖徵帶有 cluster=true 與 point_count
+    """
+    try:
+        latitude, longitude = coordinates.split(",")
+        lat, lng = float(latitude), float(longitude)
+        zoom_param = request.query_params.get("zoom")
+        zoom = int(zoom_param) if zoom_param else None
+    except ValueError:
+        return JSONResponse(
+            status_code=400,
+            content=asdict(APIResponse(
+                message="座標或縮放層級格式錯誤，座標為「緯度,經度」，縮放層級為整數。"
+            )))
     pois: gpd.GeoDataFrame = await get_nearby_poi(Coordinates(lat=lat, lng=lng), distance=500)
     if pois.empty:
         return JSONResponse(
@@ -18,11 +49,113 @@ async def get_nearby_poi_handler(coordinates: str) -> JSONResponse:
             content=asdict(APIResponse(
                 message="查無該地址附近的POI資訊。"
             )))
-    poisJSON = pois.to_json()
-    poisObj = json.loads(poisJSON)
-    return JSONResponse(
-        status_code=200,
-        content=asdict(APIResponse(
-            message="成功獲取POI資訊。",
-            data=poisObj
-        )))
+    if zoom is not None and zoom <= POI_CLUSTER_MAX_ZOOM \
+            and str(request.query_params.get("cluster")).lower() != "false":
+        pois = cluster_pois(pois, zoom, POI_CLUSTER_CELL_PX)
+    return _json_bytes_response(APIResponse(
+        message="成功獲取POI資訊。",
+        data=_serialize_pois(pois, request.query_params.get("format")),
+    ))
+
+
+async def get_nearby_poi_rings_handler(request: Request, coordinates: str) -> Response:
+    """
+    以最大半徑查詢一次 POI，回傳各類別在多個半徑內的數量、密度與最近距離
+    查詢參數：radii=300,500,1000（公尺）、include_features=true 時附上 POI 圖徵
+    """
+    try:
+        latitude, longitude = coordinates.split(",")
+        lat, lng = float(latitude), float(longitude)
+        radii_param = request.query_params.get("radii")
+        radii = sorted({int(r) for r in radii_param.split(",")}) \
+            if radii_param else DEFAULT_RING_RADII
+    except ValueError:
+        return JSONResponse(
+            status_code=400,
+            content=asdict(APIResponse(
+                message="座標或半徑格式錯誤，座標為「緯度,經度」，半徑為以逗號分隔的公尺數。"
+            )))
+    if not radii or len(radii) > MAX_RING_COUNT or radii[0] <= 0 or radii[-1] > MAX_RING_RADIUS:
+        return JSONResponse(
+            status_code=400,
+            content=asdict(APIResponse(
+                message=f"最多 {MAX_RING_COUNT} 個半徑，且需介於 1 ~ {MAX_RING_RADIUS} 公尺。"
+            )))
+
+    pois: gpd.GeoDataFrame = await get_nearby_poi(Coordinates(lat=lat, lng=lng), distance=radii[-1])
+    result = asdict(NearbyPoiRings(
+        radii=radii,
+        stats=compute_ring_stats(pois, radii, list(POI_TYPES)),
+    ))
+    if str(request.query_params.get("include_features")).lower() == "true":
+        result["features"] = _serialize_pois(pois, request.query_params.get("format"))
+
+    return _json_bytes_response(APIResponse(
+        message="成功獲取POI環域統計。",
+        data=result
+    ))
+
+
+async def get_walk_access_handler(request: Request, coordinates: str) -> Response:
+    """
+    依步行路網計算等時圈；include_poi=true 時一併查詢 POI 並附上路網距離
+    查詢參數：minutes=5,10,15（分鐘）、include_poi、format（同 nearby-poi）
+    """
+    try:
+        latitude, longitude = coordinates.split(",")
+        lat, lng = float(latitude), float(longitude)
+        minutes_param = request.query_params.get("minutes")
+        minutes = sorted({int(m) for m in minutes_param.split(",")}) \
+            if minutes_param else DEFAULT_WALK_MINUTES
+    except ValueError:
+        return JSONResponse(
+            status_code=400,
+            content=asdict(APIResponse(
+                message="座標或分鐘數格式錯誤，座標為「緯度,經度」，分鐘數以逗號分隔。"
+            )))
+    if not minutes or len(minutes) > MAX_RING_COUNT or minutes[0] <= 0 or minutes[-1] > WALK_MAX_MINUTES:
+        return JSONResponse(
+            status_code=400,
+            content=asdict(APIResponse(
+                message=f"最多 {MAX_RING_COUNT} 個分鐘數，且需介於 1 ~ {WALK_MAX_MINUTES} 分鐘。"
+            )))
+
+    coords = Coordinates(lat=lat, lng=lng)
+    pois = None
+    if str(request.query_params.get("include_poi")).lower() == "true":
+        pois = await get_nearby_poi(coords, distance=int(minutes[-1] * WALK_SPEED_M_PER_MIN))
+    try:
+        isochrones, pois = await walk_access(coords, minutes, pois)
+    except ValueError as e:
+        return JSONResponse(
+            status_code=404,
+            content=asdict(APIResponse(
+                message=str(e)
+            )))
+
+    return _json_bytes_response(APIResponse(
+        message="成功計算步行可達範圍。",
+        data={
+            "speed": WALK_SPEED_M_PER_MIN,
+            "isochrones": geojson.feature_collection(isochrones, GEOJSON_PRECISION),
+            "pois": _serialize_pois(pois, request.query_params.get("format")) if pois is not None else None,
+        }
+    ))
+
+
+def _serialize_pois(pois: gpd.GeoDataFrame, output_format: str = None):
+    if output_format == "columnar":
+        return geojson.columnar(pois, GEOJSON_PRECISION)
+    return geojson.feature_collection(pois, GEOJSON_PRECISION)
+
+
+def _json_bytes_response(response: APIResponse, status_code: int = 200) -> Response:
+    """
+    以 orjson 一次序列化回應；data 可包含已序列化的 GeoJSON 片段
+    （片段無法經過 dataclasses.asdict 複製，因此不使用 JSONResponse）
+    """
+    return Response(
+        status_code=status_code,
+        content=geojson.dumps({"message": response.message, "data": response.data}),
+        media_type="application/json",
+    )
@@ -1,9 +1,11 @@
 from fastapi import Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from dataclasses import asdict
 
-from services.points_compare import llm_compare_points
+from services.points_compare import llm_compare_points, stream_compare_points, strip_fences
 from structs.api_response import APIResponse
+from utils.disconnect import ClientDisconnectedError, cancel_on_disconnect
+from utils.sse import SSE_HEADERS, sse_event
 
 
 async def post_points_compare_handler(request: Request) -> JSONResponse:
@@ -16,9 +18,20 @@ async def post_points_compare_handler(request: Request) -> JSONResponse:
     data = await request.json()
     result: (dict | None) = None
     try:
-        result: str = await llm_compare_points(data)
-        result = result.replace("```html", "").replace("```", "")  # 去除多餘的反引號
+        result: str = await cancel_on_disconnect(request, llm_compare_points(data))
+        result = strip_fences(result)  # 去除多餘的反引號
 
+    except ClientDisconnectedError:
+        # 使用者已離開，回應不會被讀取
+        return JSONResponse(status_code=499, content=asdict(APIResponse(message="請求已取消。")))
+    except TimeoutError as e:
+        print(f"LLM 比較地點逾時: {e}")
+        return JSONResponse(
+            status_code=504,
+            content=asdict(APIResponse(
+                message=f"地點比較逾時。{str(e)}",
+            ))
+        )
     except Exception as e:
         print(f"LLM 比較地點時發生錯誤: {e}")
         return JSONResponse(
@@ -34,3 +47,31 @@ async def post_points_compare_handler(request: Request) -> JSONResponse:
             data=result
         ))
     )
+
+
+async def post_points_compare_stream_handler(request: Request) -> StreamingResponse:
+    """
+    串流版的點位比較（server-sent events）：
+    逐段送出 token 事件（HTML 片段），最後送出 result 事件（完整文字）；失敗時送出 error 事件
+    :param request: FastAPI請求對象
+    :return: StreamingResponse
+    """
+    data = await request.json()
+
+    async def events():
+        chunks = []
+        try:
+            async for text in stream_compare_points(data):
+                chunks.append(text)
+                yield sse_event("token", text)
+        except TimeoutError as e:
+            print(f"LLM 比較地點逾時: {e}")
+            yield sse_event("error", asdict(APIResponse(message=f"地點比較逾時。{str(e)}")))
+            return
+        except Exception as e:
+            print(f"LLM 比較地點時發生錯誤: {e}")
+            yield sse_event("error", asdict(APIResponse(message=f"地點比較失敗。{str(e)}")))
+            return
+        yield sse_event("result", "".join(chunks))
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
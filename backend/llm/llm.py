@@ -1,11 +1,20 @@
+"""
+這個模組是用來處理與 LLM 相關的功能的，包括 LLM 的初始化、請求和回應的處理等。
+"""
 from enum import Enum
-from config.consts import OLLAMA_BASE_URL
-from typing import Any
+from config.consts import LLM_MAX_CONCURRENCY, LLM_MODEL, LLM_TIMEOUT_SECONDS, OLLAMA_BASE_URL
+from typing import Any, AsyncIterator
+from contextlib import asynccontextmanager
 from langchain_core.messages import BaseMessage
 from langchain_ollama import ChatOllama
+import asyncio
 import json
+import time
 
-llm = ChatOllama(model="gemma3:12b", base_url=OLLAMA_BASE_URL, temperature=0.1)
+llm = ChatOllama(model=LLM_MODEL, base_url=OLLAMA_BASE_URL, temperature=0.1)
+
+# Ollama 同時處理的請求數有限，超過的請求在此排隊，而不是全部送到 Ollama 互相拖慢
+_llm_slots = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
 
 
 class ResponseMode(Enum):
@@ -14,18 +23,183 @@ class ResponseMode(Enum):
     STRING = 2
 
 
-def call_llm(anything: Any, response_mode: ResponseMode = ResponseMode.STRING) -> (str | BaseMessage | dict | None):
-    response = llm.invoke(anything)
+class LLMMetrics:
+    """
+    LLM 呼叫統計：排隊時間（等待 semaphore）與生成時間分開計算
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.started = 0  # 已取得執行名額的呼叫數
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.timeouts = 0
+        self.cancelled = 0
+        self.errors = 0
+        self.queue_seconds = 0.0
+        self.queue_seconds_max = 0.0
+        self.generation_seconds = 0.0
+        self.generation_seconds_max = 0.0
+        self.streams = 0
+        self.first_token_seconds = 0.0  # 串流呼叫取得名額後到第一個 token 的時間
+        self.prompts = 0  # 有回報 prompt 統計的呼叫數
+        self.prompt_tokens = 0
+        self.prompt_tokens_max = 0
+        self.prompt_eval_seconds = 0.0  # Ollama 處理輸入（prefill）的時間
+
+    def record_queue(self, seconds: float) -> None:
+        self.started += 1
+        self.queue_seconds += seconds
+        self.queue_seconds_max = max(self.queue_seconds_max, seconds)
+
+    def record_generation(self, seconds: float) -> None:
+        self.generation_seconds += seconds
+        self.generation_seconds_max = max(self.generation_seconds_max, seconds)
+
+    def record_prompt(self, metadata: dict) -> None:
+        """
+        :param metadata: Ollama 回應的 response_metadata（prompt_eval_count 與以奈秒計的 prompt_eval_duration）
+        """
+        tokens = (metadata or {}).get("prompt_eval_count")
+        if not tokens:
+            return
+        self.prompts += 1
+        self.prompt_tokens += tokens
+        self.prompt_tokens_max = max(self.prompt_tokens_max, tokens)
+        self.prompt_eval_seconds += (metadata.get("prompt_eval_duration") or 0) / 1e9
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": LLM_MAX_CONCURRENCY,
+            "timeout_seconds": LLM_TIMEOUT_SECONDS,
+            "calls": self.calls,
+            "waiting": self.waiting,
+            "running": self.running,
+            "completed": self.completed,
+            "timeouts": self.timeouts,
+            "cancelled": self.cancelled,
+            "errors": self.errors,
+            "queue_seconds_avg": self.queue_seconds / self.started if self.started else 0.0,
+            "queue_seconds_max": self.queue_seconds_max,
+            "generation_seconds_avg": self.generation_seconds / self.completed if self.completed else 0.0,
+            "generation_seconds_max": self.generation_seconds_max,
+            "first_token_seconds_avg": self.first_token_seconds / self.streams if self.streams else 0.0,
+            "prompt_tokens_avg": self.prompt_tokens / self.prompts if self.prompts else 0.0,
+            "prompt_tokens_max": self.prompt_tokens_max,
+            "prompt_eval_seconds_avg": self.prompt_eval_seconds / self.prompts if self.prompts else 0.0,
+        }
+
+
+LLM_METRICS = LLMMetrics()
+
+
+@asynccontextmanager
+async def _llm_slot(timeout: float = None) -> AsyncIterator[float]:
+    """
+    排隊取得 LLM 執行名額並記錄統計
+    期限從排隊開始計算；逾時或呼叫端取消（如使用者中斷連線）都會中止對 Ollama 的請求
+    :return: 期限的 event loop 時間，供 asyncio.timeout_at 使用
+    """
+    deadline = LLM_TIMEOUT_SECONDS if timeout is None else timeout
+    deadline_at = asyncio.get_running_loop().time() + deadline
+    LLM_METRICS.calls += 1
+    LLM_METRICS.waiting += 1
+    queued_at = time.perf_counter()
+    acquired = False
+    try:
+        async with asyncio.timeout_at(deadline_at):
+            await _llm_slots.acquire()
+        acquired = True
+        LLM_METRICS.waiting -= 1
+        LLM_METRICS.running += 1
+        started_at = time.perf_counter()
+        LLM_METRICS.record_queue(started_at - queued_at)
+        try:
+            yield deadline_at
+        finally:
+            LLM_METRICS.running -= 1
+            _llm_slots.release()
+        LLM_METRICS.completed += 1
+        LLM_METRICS.record_generation(time.perf_counter() - started_at)
+    except TimeoutError:
+        LLM_METRICS.timeouts += 1
+        stage = "生成" if acquired else "排隊"
+        raise TimeoutError(f"LLM 於{stage}時超過 {deadline:g} 秒期限")
+    except (asyncio.CancelledError, GeneratorExit):
+        LLM_METRICS.cancelled += 1
+        raise
+    except Exception:
+        LLM_METRICS.errors += 1
+        raise
+    finally:
+        if not acquired:
+            LLM_METRICS.waiting -= 1
+
+
+async def call_llm(
+        anything: Any,
+        response_mode: ResponseMode = ResponseMode.STRING,
+        timeout: float = None
+) -> (str | BaseMessage | dict | None):
+    """
+    非同步呼叫 LLM，不阻塞 event loop
+    :param anything: 傳給 ChatOllama 的輸入
+    :param response_mode: 回應格式
+    :param timeout: 含排隊時間的總期限（秒），預設為 LLM_TIMEOUT_SECONDS
+    :raise TimeoutError: 超過期限（排隊中或生成中）
+    """
+    async with _llm_slot(timeout) as deadline_at:
+        async with asyncio.timeout_at(deadline_at):
+            response = await llm.ainvoke(anything)
+    LLM_METRICS.record_prompt(response.response_metadata)
+    return _parse_response(response, response_mode)
+
+
+async def stream_llm(anything: Any, timeout: float = None) -> AsyncIterator[str]:
+    """
+    以串流方式呼叫 LLM，逐段產生文字；名額與期限同 call_llm
+    呼叫端提前停止迭代（aclose）時會中止對 Ollama 的請求
+    """
+    async with _llm_slot(timeout) as deadline_at:
+        stream = llm.astream(anything)
+        started_at = time.perf_counter()
+        first = True
+        try:
+            while True:
+                # 逾時只會在等待 Ollama 時觸發，不會中斷呼叫端處理每段文字
+                async with asyncio.timeout_at(deadline_at):
+                    try:
+                        chunk = await anext(stream)
+                    except StopAsyncIteration:
+                        break
+                if first:
+                    first = False
+                    LLM_METRICS.streams += 1
+                    LLM_METRICS.first_token_seconds += time.perf_counter() - started_at
+                # prompt 統計只出現在最後一段的 response_metadata
+                LLM_METRICS.record_prompt(chunk.response_metadata)
+                yield chunk.content
+        finally:
+            await stream.aclose()
+
+
+def parse_json_response(text: str) -> dict:
+    """
+    解析 LLM 回傳的 JSON（可能包在 ```json 區塊中）
+    """
+    try:
+        return json.loads(text.replace("```json", "").replace("```", "").strip())
+    except json.JSONDecodeError:
+        raise ValueError("無法解析JSON格式")
+
+
+def _parse_response(response: BaseMessage, response_mode: ResponseMode) -> (str | BaseMessage | dict | None):
     match response_mode:
         case ResponseMode.RAW:
             return response
         case ResponseMode.DICT:
-            try:
-                response = response.content.replace(
-                    "```json", "").replace("```", "").strip()
-                return json.loads(response)
-            except json.JSONDecodeError:
-                raise ValueError("無法解析JSON格式")
+            return parse_json_response(response.content)
         case ResponseMode.STRING:
             return response.content
         case _:
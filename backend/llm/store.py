@@ -0,0 +1,85 @@
+"""
+LLM 結果的持久化快取：以標準化後的輸入、模型名稱與提示詞版本組成快取鍵，
+讓 POI 順序不同或距離有些微差異的相同請求也能命中，並跨重啟、跨 worker 共用。
+"""
+import hashlib
+import json
+import math
+from typing import Any
+
+from config.consts import (
+    LLM_CACHE_DISTANCE_STEP_M,
+    LLM_CACHE_MAX_MB,
+    LLM_CACHE_PATH,
+    LLM_MODEL,
+)
+from utils.sqlite_cache import SQLiteCache
+
+LLM_STORE = SQLiteCache(
+    LLM_CACHE_PATH, table="llm_result",
+    max_bytes=int(LLM_CACHE_MAX_MB * 1024 * 1024), track_access=True)
+LLM_STORE.delete_expired()
+
+
+def llm_cache_key(prompt_version: int, canonical_input: Any) -> str:
+    """
+    :param prompt_version: 提示詞版本，修改提示詞時遞增，使舊結果失效
+    :param canonical_input: 已標準化的輸入（見 canonicalize）
+    :return: 快取鍵（不含函式名稱，由 smart_cache 加上）
+    """
+    payload = json.dumps(
+        {"model": LLM_MODEL, "prompt_version": prompt_version, "input": canonical_input},
+        ensure_ascii=False, sort_keys=True, separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def canonicalize(value: Any, float_digits: int = 6) -> Any:
+    """
+    遞迴標準化：浮點數取 float_digits 位、NaN 視為 None；字典鍵的順序由 llm_cache_key 排序
+    """
+    if isinstance(value, dict):
+        return {str(k): canonicalize(v, float_digits) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [canonicalize(v, float_digits) for v in value]
+    if isinstance(value, float):
+        return None if math.isnan(value) else round(value, float_digits)
+    return value
+
+
+def canonical_pois(pois: Any, distance_step: float = LLM_CACHE_DISTANCE_STEP_M) -> list:
+    """
+    將前端送來的 POI（GeoJSON FeatureCollection 或屬性字典列表）轉為與順序無關的形式：
+    只保留屬性（幾何已反映在 distance 中），distance 取整到 distance_step 公尺，並排序
+    """
+    if isinstance(pois, dict):
+        pois = pois.get("features") or []
+    items = []
+    for poi in pois or []:
+        if not isinstance(poi, dict):
+            continue
+        properties = poi.get("properties", poi) if poi.get("type") == "Feature" else poi
+        item = canonicalize({k: v for k, v in properties.items() if v is not None})
+        distance = item.get("distance")
+        if isinstance(distance, (int, float)):
+            item["distance"] = int(round(distance / distance_step) * distance_step)
+        items.append(item)
+    return sorted(items, key=lambda item: json.dumps(item, ensure_ascii=False, sort_keys=True))
+
+
+if __name__ == "__main__":
+    # 快取命中報告（所有 worker 共用的檔案）；於 backend 目錄下執行：python -m llm.store
+    conn = LLM_STORE._conn()
+    stats = LLM_STORE.stats()
+    total_hits = conn.execute(f"SELECT COALESCE(SUM(hit_count), 0) FROM {LLM_STORE.table}").fetchone()[0]
+    print(f"{stats['entries']} 筆，{stats['bytes'] / 1024:.1f} KB / 上限 {LLM_CACHE_MAX_MB:g} MB，"
+          f"累計命中 {total_hits} 次")
+    rows = conn.execute(f"""
+        SELECT substr(key, 1, instr(key, ':') - 1) AS name, COUNT(*), SUM(hit_count),
+               SUM(hit_count > 0)
+        FROM {LLM_STORE.table} GROUP BY name
+    """).fetchall()
+    for name, entries, hits, reused in rows:
+        # 每筆寫入代表一次實際生成；命中率 = 命中 /（命中 + 生成）
+        print(f"  {name}: {entries} 筆（{reused} 筆曾被重用），命中 {hits} 次，"
+              f"命中率 {hits / (hits + entries):.1%}")
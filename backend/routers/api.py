@@ -1,10 +1,15 @@
 from fastapi import FastAPI, APIRouter, Request
 
-from handlers.intersect_handler import get_intersect_handler
+from handlers.intersect_handler import get_intersect_handler, post_intersect_batch_handler
 from handlers.generate_floor_handler import post_generate_floor_handler
-from handlers.poi_handler import get_nearby_poi_handler
-from handlers.nearby_analysis_handler import post_nearby_analysis_handler
-from handlers.points_compare_handler import post_points_compare_handler
+from handlers.poi_handler import (
+    get_nearby_poi_handler,
+    get_nearby_poi_rings_handler,
+    get_walk_access_handler,
+)
+from handlers.nearby_analysis_handler import post_nearby_analysis_handler, post_nearby_analysis_stream_handler
+from handlers.points_compare_handler import post_points_compare_handler, post_points_compare_stream_handler
+from handlers.metrics_handler import get_metrics_handler
 
 
 def set_api_routes(app: FastAPI) -> None:
@@ -17,20 +22,44 @@ def set_api_routes(app: FastAPI) -> None:
     async def api_intersect(x: str, request: Request):
         return await get_intersect_handler(request, x)
 
+    @api_router.post("/intersect/batch")
+    async def api_intersect_batch(request: Request):
+        return await post_intersect_batch_handler(request)
+
     @api_router.post("/generate-floor")
     async def api_generate_floor(request: Request):
         return await post_generate_floor_handler(request)
 
     @api_router.get("/nearby-poi/{coordinates}")
-    async def api_nearby_poi(coordinates: str):
-        return await get_nearby_poi_handler(coordinates)
+    async def api_nearby_poi(coordinates: str, request: Request):
+        return await get_nearby_poi_handler(request, coordinates)
+
+    @api_router.get("/nearby-poi-rings/{coordinates}")
+    async def api_nearby_poi_rings(coordinates: str, request: Request):
+        return await get_nearby_poi_rings_handler(request, coordinates)
+
+    @api_router.get("/walk-access/{coordinates}")
+    async def api_walk_access(coordinates: str, request: Request):
+        return await get_walk_access_handler(request, coordinates)
 
     @api_router.post("/nearby-analysis")
     async def api_nearby_analysis(request: Request):
         return await post_nearby_analysis_handler(request)
 
+    @api_router.post("/nearby-analysis/stream")
+    async def api_nearby_analysis_stream(request: Request):
+        return await post_nearby_analysis_stream_handler(request)
+
     @api_router.post("/compare-points")
     async def api_compare_points(request: Request):
         return await post_points_compare_handler(request)
 
+    @api_router.post("/compare-points/stream")
+    async def api_compare_points_stream(request: Request):
+        return await post_points_compare_stream_handler(request)
+
+    @api_router.get("/metrics")
+    async def api_metrics():
+        return await get_metrics_handler()
+
     app.include_router(api_router)
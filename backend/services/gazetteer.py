@@ -0,0 +1,231 @@
+import re
+import threading
+import time
+from typing import Optional
+import numpy as np
+import pandas as pd
+from pyproj import Transformer
+
+from structs.adress_point import Coordinates
+from utils.address import normalize_address
+
+
+# 門牌點位資料的欄位（依內政部 / 台北市門牌坐標資料），不存在的欄位會略過
+GAZETTEER_COLUMNS = {
+    "city": "縣市",
+    "district": "鄉鎮市區",
+    "road": "街路段",
+    "area": "地區",
+    "lane": "巷",
+    "alley": "弄",
+    "number": "號",
+    "x": "橫座標",
+    "y": "縱座標",
+}
+
+# 標準化後的地址：[縣市][鄉鎮市區][村里][鄰] 路街段 [巷] [弄] 號
+_ADDRESS_PATTERN = re.compile(
+    r"^(?:(?P<city>..[市縣]))?"
+    r"(?:(?P<district>.{1,3}?[區鄉鎮市]))?"
+    r"(?:.{1,3}?[村里](?=.+[路街道段巷弄]))?"
+    r"(?:\d+鄰)?"
+    r"(?P<road>.+?(?:路|街|大道|段)(?:\d+段)?|.+?)"
+    r"(?:(?P<lane>\d+(?:之\d+)?)巷)?"
+    r"(?:(?P<alley>\d+(?:之\d+)?)弄)?"
+    r"(?P<number>\d+(?:之\d+)?)號"
+)
+
+
+def address_key(address: str) -> Optional[tuple[str, str, str]]:
+    """
+    將地址拆為門牌比對用的鍵
+    :return: (縣市, 鄉鎮市區, 路街段|巷|弄|號)；無法解析時為 None
+    """
+    match = _ADDRESS_PATTERN.match(normalize_address(address))
+    if not match:
+        return None
+    parts = match.groupdict()
+    return (
+        parts["city"] or "",
+        parts["district"] or "",
+        "|".join(parts[k] or "" for k in ("road", "lane", "alley", "number")),
+    )
+
+
+def _add_unique(index: dict, key, i: int) -> None:
+    # 同一鍵出現第二次即標記為不唯一（-1）
+    index[key] = i if key not in index else -1
+
+
+class Gazetteer:
+    """
+    以門牌點位資料建立的離線地理編碼索引。
+    各縣市的鄉鎮市區與路名多有重複（如台北市與基隆市都有信義區），因此鍵包含縣市：
+    地址寫明縣市時只在該縣市內比對，資料不含該縣市則不回傳（交由上游地理編碼）；
+    地址省略縣市或鄉鎮市區時，僅在門牌於對應範圍內唯一時回傳。
+    """
+
+    def __init__(self, lats: np.ndarray, lngs: np.ndarray, keys: list[tuple[str, str, str]]):
+        self.lats = lats
+        self.lngs = lngs
+        self.cities = {city for city, _, _ in keys}
+        self.by_address: dict[tuple[str, str, str], int] = {}
+        # 以下在門牌不唯一時為 -1
+        self.by_city_street: dict[tuple[str, str], int] = {}
+        self.by_district_street: dict[tuple[str, str], int] = {}
+        self.by_street: dict[str, int] = {}
+        for i, (city, district, street) in enumerate(keys):
+            self.by_address.setdefault((city, district, street), i)
+            _add_unique(self.by_city_street, (city, street), i)
+            _add_unique(self.by_district_street, (district, street), i)
+            _add_unique(self.by_street, street, i)
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_csv(cls, file_path: str, srid: int = 3826, default_city: str = "") -> "Gazetteer":
+        """
+        :param file_path: 門牌點位 CSV
+        :param srid: 座標系（預設 TWD97 二度分帶）
+        :param default_city: 資料沒有縣市欄位時（如單一縣市的門牌資料）所屬的縣市
+        """
+        columns = GAZETTEER_COLUMNS
+        df = pd.read_csv(file_path, dtype=str, encoding="utf-8-sig")
+        df = df.dropna(subset=[columns["x"], columns["y"], columns["number"]])
+
+        def column(name: str, suffix: str = "") -> pd.Series:
+            if columns[name] not in df.columns:
+                return pd.Series("", index=df.index)
+            values = df[columns[name]].fillna("").str.strip()
+            if suffix:
+                # 欄位可能只有數字，也可能已含「巷」「弄」「號」
+                values = values.where(
+                    (values == "") | values.str.endswith(suffix), values + suffix)
+            return values
+
+        city = column("city")
+        if default_city:
+            city = city.where(city != "", default_city)
+        addresses = (
+            city + column("district") + column("road") + column("area")
+            + column("lane", "巷") + column("alley", "弄") + column("number", "號")
+        )
+        keys = [address_key(addr) for addr in addresses]
+        valid = np.array([key is not None for key in keys])
+
+        x = df[columns["x"]].astype(float).to_numpy()[valid]
+        y = df[columns["y"]].astype(float).to_numpy()[valid]
+        if srid != 4326:
+            x, y = Transformer.from_crs(srid, 4326, always_xy=True).transform(x, y)
+
+        return cls(
+            lats=np.asarray(y),
+            lngs=np.asarray(x),
+            keys=[key for key in keys if key is not None],
+        )
+
+    def lookup(self, address: str) -> Optional[Coordinates]:
+        """
+        :return: 座標；查無門牌時為 None
+        """
+        key = address_key(address)
+        index = -1
+        if key is not None:
+            city, district, street = key
+            if city and city not in self.cities:
+                index = -1  # 資料不含此縣市，不以其他縣市的同名門牌回應
+            elif city and district:
+                index = self.by_address.get(key, -1)
+            elif city:
+                index = self.by_city_street.get((city, street), -1)
+            elif district:
+                index = self.by_district_street.get((district, street), -1)
+            else:
+                index = self.by_street.get(street, -1)
+        if index < 0:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return Coordinates(lat=float(self.lats[index]), lng=float(self.lngs[index]))
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "points": len(self.lats),
+            "cities": len(self.cities),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+_gazetteer: Gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer(file_path: str, srid: int = 3826, default_city: str = "") -> Gazetteer:
+    """
+    取得（必要時建立）程序內共用的門牌索引；首次呼叫會讀檔，應於執行緒中呼叫
+    """
+    global _gazetteer
+    if _gazetteer is None:
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                start = time.perf_counter()
+                _gazetteer = Gazetteer.from_csv(file_path, srid, default_city)
+                print(
+                    f"門牌索引載入完成，共 {len(_gazetteer.lats)} 筆，"
+                    f"耗時 {time.perf_counter() - start:.1f} 秒"
+                )
+    return _gazetteer
+
+
+def gazetteer_stats() -> Optional[dict]:
+    """
+    :return: 門牌索引的命中統計；尚未載入時為 None
+    """
+    return _gazetteer.stats() if _gazetteer is not None else None
+
+
+if __name__ == "__main__":
+    # 以地址清單量測離線門牌比對的命中率與延遲；加上 --fallback 時另量測未命中者的 ArcGIS 延遲
+    # 於 backend 目錄下執行：python -m services.gazetteer <地址清單.txt> [--fallback]
+    import statistics
+    import sys
+    from config.consts import GAZETTEER_CITY, GAZETTEER_PATH, GAZETTEER_SRID
+    from services.geocoding import arcgis_geocode
+
+    with open(sys.argv[1], encoding="utf-8") as f:
+        sample = [line.strip() for line in f if line.strip()]
+
+    gazetteer = get_gazetteer(GAZETTEER_PATH, GAZETTEER_SRID, GAZETTEER_CITY)
+
+    latencies = []
+    missed = []
+    for addr in sample:
+        t0 = time.perf_counter()
+        result = gazetteer.lookup(addr)
+        latencies.append((time.perf_counter() - t0) * 1e6)
+        if result is None:
+            missed.append(addr)
+
+    latencies.sort()
+    stats = gazetteer.stats()
+    print(f"門牌比對：{len(sample)} 筆，命中率 {stats['hit_ratio']:.1%}")
+    print(
+        f"  p50={statistics.median(latencies):.1f}µs "
+        f"p99={latencies[int(len(latencies) * 0.99) - 1]:.1f}µs "
+        f"max={latencies[-1]:.1f}µs"
+    )
+
+    if "--fallback" in sys.argv and missed:
+        fallback = []
+        for addr in missed:
+            t0 = time.perf_counter()
+            arcgis_geocode(addr)
+            fallback.append((time.perf_counter() - t0) * 1000)
+        fallback.sort()
+        print(
+            f"ArcGIS 備援：{len(missed)} 筆，"
+            f"p50={statistics.median(fallback):.0f}ms max={fallback[-1]:.0f}ms"
+        )
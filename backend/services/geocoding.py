@@ -1,15 +1,173 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Optional
 from geopy.geocoders import ArcGIS
 
+from config.consts import (
+    GAZETTEER_CITY,
+    GAZETTEER_PATH,
+    GAZETTEER_SRID,
+    GEOCODE_BURST,
+    GEOCODE_CACHE_PATH,
+    GEOCODE_CACHE_TTL_SECONDS,
+    GEOCODE_MAX_WORKERS,
+    GEOCODE_NEGATIVE_TTL_SECONDS,
+    GEOCODE_RATE_PER_SECOND,
+)
+from services.gazetteer import Gazetteer, get_gazetteer
 from structs.adress_point import Coordinates
+from utils.address import normalize_address
+from utils.rate_limit import TokenBucket
+from utils.singleflight import SingleFlight
+from utils.sqlite_cache import SQLiteCache
 
 # 初始化匿名 ArcGIS geocoder
 geolocator = ArcGIS(timeout=10)
 
+# 以標準化地址為鍵；查無結果也會快取（值為 None），避免重複查詢無效地址
+GEOCODE_CACHE = SQLiteCache(GEOCODE_CACHE_PATH, table="geocode")
+GEOCODE_CACHE.delete_expired()
+
+# 呼叫 ArcGIS 專用的執行緒池與限流；快取與門牌命中不受限制
+_upstream_pool = ThreadPoolExecutor(
+    max_workers=GEOCODE_MAX_WORKERS, thread_name_prefix="geocode")
+_upstream_bucket = TokenBucket(GEOCODE_RATE_PER_SECOND, GEOCODE_BURST)
+# 同一標準化地址同時只送出一個查詢
+_inflight = SingleFlight()
+
 
 def arcgis_geocode(addr: str) -> Coordinates:
     try:
-        location = geolocator.geocode(addr)
-        if location:
-            return Coordinates(lat=location.latitude, lng=location.longitude)
+        return _arcgis_lookup(addr)
     except:
         return Coordinates(lat=None, lng=None)
+
+
+def geocode(addr: str) -> Optional[Coordinates]:
+    """
+    依序查詢離線門牌索引、地理編碼快取，皆未命中才呼叫 ArcGIS 並寫回快取。
+    連線錯誤等暫時性失敗不寫入快取。
+    :return: 座標；查無結果為 None，查詢失敗為 Coordinates(lat=None, lng=None)
+    """
+    key = normalize_address(addr)
+    found, coordinates = _lookup_local(addr, key)
+    if found:
+        return coordinates
+    return _lookup_upstream(addr, key)
+
+
+async def geocode_async(addr: str) -> Optional[Coordinates]:
+    """
+    geocode 的非同步版本：同一地址同時只查詢一次，呼叫 ArcGIS 時受並行數與限流約束
+    """
+    key = normalize_address(addr)
+    return await _inflight.do(key, lambda: _geocode_once(addr, key))
+
+
+async def geocode_many(addresses: list[str]) -> AsyncIterator[tuple[int, Optional[Coordinates]]]:
+    """
+    並行地理編碼多個地址，依完成順序逐筆產出；單筆失敗（如快取或門牌索引錯誤）不影響其他地址
+    :return: (地址索引, 座標) 的非同步迭代器；座標格式同 geocode
+    """
+    async def indexed(i: int, addr: str) -> tuple[int, Optional[Coordinates]]:
+        try:
+            return i, await geocode_async(addr)
+        except Exception as e:
+            print(f"地理編碼失敗（{addr}）: {e}")
+            return i, Coordinates(lat=None, lng=None)
+
+    tasks = [asyncio.ensure_future(indexed(i, addr)) for i, addr in enumerate(addresses)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # 呼叫端提前停止迭代時，取消尚未完成的查詢
+        for task in tasks:
+            task.cancel()
+
+
+def geocode_stats() -> dict:
+    return {
+        "cache": GEOCODE_CACHE.stats(),
+        "upstream": {
+            **_inflight.stats(),
+            "rate_limit_wait_seconds": _upstream_bucket.waited,
+        },
+    }
+
+
+async def _geocode_once(addr: str, key: str) -> Optional[Coordinates]:
+    found, coordinates = await asyncio.to_thread(_lookup_local, addr, key)
+    if found:
+        return coordinates
+    await _upstream_bucket.acquire()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_upstream_pool, _lookup_upstream, addr, key)
+
+
+def _lookup_local(addr: str, key: str) -> tuple[bool, Optional[Coordinates]]:
+    """
+    查詢離線門牌索引與地理編碼快取
+    :return: (是否命中, 座標)；負快取命中時座標為 None
+    """
+    gazetteer = _local_gazetteer()
+    if gazetteer is not None:
+        coordinates = gazetteer.lookup(addr)
+        if coordinates is not None:
+            return True, coordinates
+
+    found, cached = GEOCODE_CACHE.get(key)
+    if found:
+        return True, Coordinates(**cached) if cached else None
+    return False, None
+
+
+def _lookup_upstream(addr: str, key: str) -> Optional[Coordinates]:
+    """
+    呼叫 ArcGIS 並寫回快取
+    """
+    try:
+        coordinates = _arcgis_lookup(addr)
+    except Exception as e:
+        print(f"地理編碼失敗（{addr}）: {e}")
+        return Coordinates(lat=None, lng=None)
+
+    if coordinates is None:
+        GEOCODE_CACHE.set(key, None, GEOCODE_NEGATIVE_TTL_SECONDS)
+    else:
+        GEOCODE_CACHE.set(
+            key,
+            {"lat": coordinates.lat, "lng": coordinates.lng},
+            GEOCODE_CACHE_TTL_SECONDS,
+        )
+    return coordinates
+
+
+_gazetteer_failed = False
+
+
+def _local_gazetteer() -> Optional[Gazetteer]:
+    """
+    :return: 門牌索引；未設定、檔案不存在或載入失敗時為 None
+    """
+    global _gazetteer_failed
+    if _gazetteer_failed or not GAZETTEER_PATH or not os.path.exists(GAZETTEER_PATH):
+        return None
+    try:
+        return get_gazetteer(GAZETTEER_PATH, GAZETTEER_SRID, GAZETTEER_CITY)
+    except Exception as e:
+        # 只嘗試一次，之後一律改用 ArcGIS
+        _gazetteer_failed = True
+        print(f"門牌索引載入失敗，改用 ArcGIS: {e}")
+        return None
+
+
+def _arcgis_lookup(addr: str) -> Optional[Coordinates]:
+    """
+    :return: 座標，查無結果時為 None；連線錯誤時拋出例外
+    """
+    location = geolocator.geocode(addr)
+    if location:
+        return Coordinates(lat=location.latitude, lng=location.longitude)
+    return None
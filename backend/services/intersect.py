@@ -1,10 +1,20 @@
+import asyncio
+import time
 from enum import Enum
 from sqlalchemy import text
 
 
-from database.connect import POSTGIS_ENGINE
-from database.load_data import DBTableName
-from structs.adress_point import AddressPoint
+from config.consts import (
+    ZONING_BACKEND,
+    ZONING_CACHE_CELL_METERS,
+    ZONING_CACHE_MAX_CELLS,
+)
+from database.geo_files import GEO_FILES
+from database.manifest import DATA_VERSION_SQL
+from database.spatial_index import subdivided_table_name
+from services.local_zoning import get_local_engine
+from services.zoning_cache import ZoningGridCache
+from structs.adress_point import AddressPoint, Coordinates
 from structs.zoing import Zoning
 from utils.safe_extract import safe_extract
 
@@ -17,54 +27,344 @@ class LandUseData(Enum):
 
 # 對應表名 Enum 來自 load_data_into_db()
 # DBTableName.TAIPEI_LANDUSE.value => "taipei_landuse"
+# 查詢一律使用切分後的 <表名>_subdivided（見 database/spatial_index.py）
+# 切分線上的點不在任何一塊的內部，因此以 ST_Intersects 取代 ST_Within
+if ZONING_BACKEND != "local":
+    # 與原本相同，啟動時匯入圖層；本地引擎不需要資料庫，不在此匯入
+    import database.load_data  # noqa: F401
+
+# 因欄位名稱不同需動態切換（依序為 zone, far, bcr）
+ZONE_COLUMNS = {
+    LandUseData.TAIPEI: ("zone", "far", "bcr"),
+    LandUseData.TAIWAN: ("使用分", "容積率", "建蔽率"),
+}
+
+# 本地分區引擎以 GEO_FILES 的圖層名稱對應欄位
+_ZONE_COLUMNS_BY_LAYER = {
+    "TAIPEI_LANDUSE": ZONE_COLUMNS[LandUseData.TAIPEI],
+    "TAIWAN_LANDUSE": ZONE_COLUMNS[LandUseData.TAIWAN],
+}
+
+
+def _zone_lateral(landuse: LandUseData, table: str, alias: str, extra_filter: str = "") -> str:
+    zone, far, bcr = ZONE_COLUMNS[landuse]
+    return f"""
+        LEFT JOIN LATERAL (
+            SELECT true AS hit, "{zone}" AS zone, "{far}" AS far, "{bcr}" AS bcr
+            FROM {table} z
+            WHERE {extra_filter}ST_Intersects(z.geometry, pt.geom)
+            LIMIT 1
+        ) AS {alias} ON true"""
+
+
+def _layer_tables() -> dict[str, str]:
+    """
+    :return: 圖層名稱 ➜ 資料表名稱；PostGIS 模式只含本次啟動成功匯入的圖層，
+             本地模式不匯入，退回 PostGIS 時沿用資料庫中既有的資料表
+    """
+    if ZONING_BACKEND == "local":
+        return {name: name.lower() for name in GEO_FILES}
+    from database.load_data import DBTableName
+    return {member.name: member.value for member in DBTableName}
+
+
+def _zoning_sql(tables: dict[str, str]):
+    """
+    一次查詢取得台北分區、全台分區（台北查無時才查）與公有地
+    多個點以陣列傳入並 unnest，整批點位在同一個查詢中完成
+    兩個分區表的欄位型別不一定相同，故分別回傳，優先順序於 _build_zoning 判斷
+    """
+    return text(f"""
+        SELECT
+            pt.ord,
+            tp.hit AS tp_hit, tp.zone AS tp_zone, tp.far AS tp_far, tp.bcr AS tp_bcr,
+            tw.hit AS tw_hit, tw.zone AS tw_zone, tw.far AS tw_far, tw.bcr AS tw_bcr,
+            EXISTS (
+                SELECT 1
+                FROM {subdivided_table_name(tables["PUBLIC_LAND"])} p
+                WHERE ST_Intersects(p.geometry, pt.geom)
+            ) AS is_public
+        FROM (
+            SELECT u.ord, ST_SetSRID(ST_MakePoint(u.lng, u.lat), 4326) AS geom
+            FROM unnest(
+                CAST(:ords AS INTEGER[]),
+                CAST(:lngs AS DOUBLE PRECISION[]),
+                CAST(:lats AS DOUBLE PRECISION[])
+            ) AS u(ord, lng, lat)
+        ) AS pt
+        {_zone_lateral(
+            LandUseData.TAIPEI,
+            subdivided_table_name(tables["TAIPEI_LANDUSE"]),
+            "tp",
+        )}
+        {_zone_lateral(
+            LandUseData.TAIWAN,
+            subdivided_table_name(tables["TAIWAN_LANDUSE"]),
+            "tw",
+            extra_filter="tp.hit IS NULL AND ",
+        )}
+    """)
+
+
+def _cell_lateral(table: str, alias: str, columns: tuple[str, str, str] = None) -> str:
+    # 相交圖徵的屬性組合數；轉為文字比較，NULL 與空字串可區分
+    kinds = (
+        "count(DISTINCT CAST(ROW({}) AS TEXT))".format(
+            ", ".join(f'z."{col}"' for col in columns))
+        if columns else "1"
+    )
+    return f"""
+        CROSS JOIN LATERAL (
+            SELECT
+                count(*) > 0 AS touch,
+                coalesce(bool_or(ST_Covers(z.geometry, c.env)), false) AS covered,
+                {kinds} AS kinds
+            FROM {table} z
+            WHERE ST_Intersects(z.geometry, c.env)
+        ) AS {alias}"""
+
+
+def _cell_sql(tables: dict[str, str]):
+    """
+    判斷格網內所有點的查詢結果是否必定相同（整格落在同一分區、同一公有地狀態內）
+    條件與 LocalZoningEngine.classify_cells 相同
+    """
+    return text(f"""
+        SELECT
+            c.ord,
+            (NOT tp.touch OR (tp.covered AND tp.kinds = 1))
+            AND (tp.touch OR NOT tw.touch OR (tw.covered AND tw.kinds = 1))
+            AND (NOT pub.touch OR pub.covered) AS stable
+        FROM (
+            SELECT u.ord, ST_MakeEnvelope(u.xmin, u.ymin, u.xmax, u.ymax, 4326) AS env
+            FROM unnest(
+                CAST(:ords AS INTEGER[]),
+                CAST(:xmins AS DOUBLE PRECISION[]),
+                CAST(:ymins AS DOUBLE PRECISION[]),
+                CAST(:xmaxs AS DOUBLE PRECISION[]),
+                CAST(:ymaxs AS DOUBLE PRECISION[])
+            ) AS u(ord, xmin, ymin, xmax, ymax)
+        ) AS c
+        {_cell_lateral(
+            subdivided_table_name(tables["TAIPEI_LANDUSE"]),
+            "tp",
+            ZONE_COLUMNS[LandUseData.TAIPEI],
+        )}
+        {_cell_lateral(
+            subdivided_table_name(tables["TAIWAN_LANDUSE"]),
+            "tw",
+            ZONE_COLUMNS[LandUseData.TAIWAN],
+        )}
+        {_cell_lateral(
+            subdivided_table_name(tables["PUBLIC_LAND"]),
+            "pub",
+        )}
+    """)
+
+
+_postgis_sql: dict = None
+
+
+def _get_postgis_sql() -> dict:
+    """
+    首次查詢 PostGIS 時才組出 SQL；有圖層未成功匯入時只讓需要它的請求失敗，不影響模組載入
+    :return: {"zoning": 點位查詢, "cell": 格網判斷}
+    """
+    global _postgis_sql
+    if _postgis_sql is None:
+        tables = _layer_tables()
+        missing = [name for name in GEO_FILES if name not in tables]
+        if missing:
+            raise RuntimeError(f"圖層未成功匯入 PostGIS: {', '.join(missing)}")
+        _postgis_sql = {"zoning": _zoning_sql(tables), "cell": _cell_sql(tables)}
+    return _postgis_sql
+
+# 使用分區格網快取；重新匯入分區資料後（資料版本改變）會清空
+ZONING_CACHE = ZoningGridCache(
+    cell_meters=ZONING_CACHE_CELL_METERS,
+    max_cells=ZONING_CACHE_MAX_CELLS,
+)
+_VERSION_CHECK_SECONDS = 60
+_last_version_check = 0.0
+_version_check_task: asyncio.Task = None
 
 
 async def intersect_with_zones(address_point: AddressPoint) -> Zoning:
-    pt_wkt = f"SRID=4326;POINT({address_point.coordinates.lng} {address_point.coordinates.lat})"
+    zonings = await intersect_many([address_point.coordinates])
+    return zonings[0]
 
-    zone_row = None
 
-    for landuse in (LandUseData.TAIPEI, LandUseData.TAIWAN):
-        # 對應表名
-        table = {
-            LandUseData.TAIPEI: DBTableName.TAIPEI_LANDUSE.value,
-            LandUseData.TAIWAN: DBTableName.TAIWAN_LANDUSE.value,
-        }[landuse]
-
-        # 因欄位名稱不同需動態切換
-        columns = {
-            LandUseData.TAIPEI: "zone, far, bcr",
-            LandUseData.TAIWAN: '"使用分" AS zone, "容積率" AS far, "建蔽率" AS bcr',
-        }[landuse]
-
-        sql = text(f"""
-            SELECT {columns}
-            FROM {table}
-            WHERE ST_Within(
-                ST_GeomFromText(:pt_wkt, 4326),
-                geometry
+async def intersect_many(coordinates: list[Coordinates]) -> list[Zoning]:
+    """
+    批次查詢多個座標的使用分區與公有地，結果依輸入順序回傳
+    :param coordinates: 座標列表
+    :return: 與輸入等長的 Zoning 列表
+    """
+    if not coordinates:
+        return []
+
+    _schedule_version_check()
+
+    zonings = [ZONING_CACHE.get(c) for c in coordinates]
+    pending = [i for i, zoning in enumerate(zonings) if zoning is None]
+    if not pending:
+        return zonings
+
+    pending_coordinates = [coordinates[i] for i in pending]
+    generation = ZONING_CACHE.generation
+    exact = await _intersect_exact(pending_coordinates)
+    for i, zoning in zip(pending, exact):
+        zonings[i] = zoning
+
+    try:
+        await _cache_cells(pending_coordinates, exact, generation)
+    except Exception as e:
+        # 快取失敗不影響查詢結果
+        print(f"判斷分區格網時發生錯誤: {e}")
+
+    return zonings
+
+
+async def _intersect_exact(coordinates: list[Coordinates]) -> list[Zoning]:
+    if ZONING_BACKEND == "local":
+        try:
+            return await _intersect_local(coordinates)
+        except Exception as e:
+            print(f"本地分區引擎查詢失敗，改用 PostGIS: {e}")
+
+    return await _intersect_postgis(coordinates)
+
+
+async def _cache_cells(coordinates: list[Coordinates], zonings: list[Zoning], generation: int) -> None:
+    """
+    判斷尚未分類的格網是否可快取：可快取的存入該點的查詢結果，其餘標記為邊界格
+    :param generation: 查詢開始時的 ZONING_CACHE.generation；期間快取被清空（資料版本改變）則不寫入
+    """
+    if ZONING_CACHE.generation != generation:
+        return
+    cell_zoning = {}
+    for c, zoning in zip(coordinates, zonings):
+        cell = ZONING_CACHE.cell_of(c)
+        if not ZONING_CACHE.is_known(cell):
+            cell_zoning.setdefault(cell, zoning)
+    if not cell_zoning:
+        return
+
+    cells = list(cell_zoning)
+    bounds = [ZONING_CACHE.cell_bounds(cell) for cell in cells]
+    stable = await _classify_cells(bounds)
+    if ZONING_CACHE.generation != generation:
+        return
+    for cell, is_stable in zip(cells, stable):
+        if is_stable:
+            ZONING_CACHE.put(cell, cell_zoning[cell])
+        else:
+            ZONING_CACHE.mark_boundary(cell)
+
+
+async def _classify_cells(bounds: list[tuple[float, float, float, float]]) -> list[bool]:
+    if ZONING_BACKEND == "local":
+        try:
+            engine = await asyncio.to_thread(
+                get_local_engine, GEO_FILES, _ZONE_COLUMNS_BY_LAYER)
+            return await asyncio.to_thread(engine.classify_cells, bounds)
+        except Exception as e:
+            print(f"本地分區引擎判斷格網失敗，改用 PostGIS: {e}")
+
+    from database.connect import POSTGIS_ASYNC_ENGINE
+
+    xmins, ymins, xmaxs, ymaxs = (list(v) for v in zip(*bounds))
+    params = {
+        "ords": list(range(len(bounds))),
+        "xmins": xmins,
+        "ymins": ymins,
+        "xmaxs": xmaxs,
+        "ymaxs": ymaxs,
+    }
+    async with POSTGIS_ASYNC_ENGINE.connect() as conn:
+        result = await conn.execute(_get_postgis_sql()["cell"], params)
+        rows = result.mappings().all()
+
+    stable = [False] * len(bounds)
+    for row in rows:
+        stable[row["ord"]] = bool(row["stable"])
+    return stable
+
+
+def _schedule_version_check() -> None:
+    """
+    定期於背景比對分區資料版本，資料重新匯入後清空格網快取
+    本地引擎在程序存活期間不會重新載入，快取內容與其一致，不需比對
+    """
+    global _last_version_check, _version_check_task
+    if ZONING_BACKEND == "local":
+        return
+    now = time.monotonic()
+    if now - _last_version_check < _VERSION_CHECK_SECONDS:
+        return
+    _last_version_check = now
+    _version_check_task = asyncio.create_task(_check_data_version())
+
+
+async def _check_data_version() -> None:
+    from database.connect import POSTGIS_ASYNC_ENGINE
+
+    try:
+        async with POSTGIS_ASYNC_ENGINE.connect() as conn:
+            result = await conn.execute(
+                DATA_VERSION_SQL,
+                {"layers": [name.lower() for name in GEO_FILES]},
             )
-            LIMIT 1
-        """)
-        with POSTGIS_ENGINE.connect() as conn:
-            result = conn.execute(sql, {"pt_wkt": pt_wkt}).mappings().first()
-        if result:
-            zone_row = result
+            version = result.scalar()
+    except Exception as e:
+        print(f"檢查分區資料版本時發生錯誤: {e}")
+        return
+    if version != ZONING_CACHE.data_version:
+        ZONING_CACHE.invalidate(version)
+
+
+async def _intersect_local(coordinates: list[Coordinates]) -> list[Zoning]:
+    engine = await asyncio.to_thread(
+        get_local_engine, GEO_FILES, _ZONE_COLUMNS_BY_LAYER)
+    rows = await asyncio.to_thread(
+        engine.query,
+        [c.lng for c in coordinates],
+        [c.lat for c in coordinates],
+    )
+    return [_build_zoning(row) for row in rows]
+
+
+async def _intersect_postgis(coordinates: list[Coordinates]) -> list[Zoning]:
+    from database.connect import POSTGIS_ASYNC_ENGINE
+
+    params = {
+        "ords": list(range(len(coordinates))),
+        "lngs": [c.lng for c in coordinates],
+        "lats": [c.lat for c in coordinates],
+    }
+    async with POSTGIS_ASYNC_ENGINE.connect() as conn:
+        result = await conn.execute(_get_postgis_sql()["zoning"], params)
+        rows = result.mappings().all()
+
+    zonings: list[Zoning] = [None] * len(coordinates)
+    for row in rows:
+        zonings[row["ord"]] = _build_zoning(row)
+    return zonings
+
+
+def _build_zoning(row) -> Zoning:
+    """
+    依優先順序（台北 ➜ 全台）取出分區，並整理為 Zoning
+    """
+    zone_row = None
+    for prefix in ("tp", "tw"):
+        if row[f"{prefix}_hit"]:
+            zone_row = {
+                key: row[f"{prefix}_{key}"] for key in ("zone", "far", "bcr")
+            }
             break
 
-    # 查詢公有地
-    sql_pub = text(f"""
-        SELECT 1
-        FROM {DBTableName.PUBLIC_LAND.value}
-        WHERE ST_Within(
-            ST_GeomFromText(:pt_wkt, 4326),
-            geometry
-        )
-        LIMIT 1
-    """)
-    with POSTGIS_ENGINE.connect() as conn:
-        is_pub = conn.execute(sql_pub, {"pt_wkt": pt_wkt}).scalar()
-        is_public = "Y" if is_pub else "N"
+    is_public = "Y" if row["is_public"] else "N"
 
     zone_value = safe_extract(zone_row.get("zone")) if zone_row else None
 
@@ -80,3 +380,76 @@ async def intersect_with_zones(address_point: AddressPoint) -> Zoning:
         bcr=bcr_value,
         is_public_land=is_public,
     )
+
+
+if __name__ == "__main__":
+    # 併發壓測：量測大量平行查詢時 event loop 的延遲是否維持平穩
+    # 於 backend 目錄下執行：python -m services.intersect
+    import random
+    import statistics
+    from database.connect import POSTGIS_ASYNC_ENGINE, POSTGIS_ENGINE
+
+    def _random_point() -> AddressPoint:
+        # 台北市範圍內的隨機點
+        return AddressPoint(
+            address="benchmark",
+            coordinates=Coordinates(
+                lat=random.uniform(25.00, 25.10),
+                lng=random.uniform(121.48, 121.60),
+            ),
+        )
+
+    async def _blocking_intersect(address_point: AddressPoint) -> None:
+        # 舊作法：在 async 函式中直接使用同步 engine
+        params = {
+            "ords": [0],
+            "lngs": [address_point.coordinates.lng],
+            "lats": [address_point.coordinates.lat],
+        }
+        with POSTGIS_ENGINE.connect() as conn:
+            conn.execute(_get_postgis_sql()["zoning"], params).mappings().first()
+
+    async def _measure_loop_lag(query, concurrency: int, requests: int) -> dict:
+        lags = []
+        stop = asyncio.Event()
+
+        async def ticker():
+            interval = 0.005
+            while not stop.is_set():
+                t0 = time.perf_counter()
+                await asyncio.sleep(interval)
+                lags.append((time.perf_counter() - t0 - interval) * 1000)
+
+        sem = asyncio.Semaphore(concurrency)
+
+        async def one():
+            async with sem:
+                await query(_random_point())
+
+        tick_task = asyncio.create_task(ticker())
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - t0
+        stop.set()
+        await tick_task
+
+        cuts = statistics.quantiles(lags, n=100) if len(lags) > 1 else [0] * 99
+        return {
+            "throughput": requests / elapsed,
+            "lag_p50": cuts[49],
+            "lag_p99": cuts[98],
+            "lag_max": max(lags, default=0),
+        }
+
+    async def _main():
+        for label, query in (("sync engine", _blocking_intersect), ("async engine", intersect_with_zones)):
+            for concurrency in (1, 10, 50):
+                r = await _measure_loop_lag(query, concurrency, requests=500)
+                print(
+                    f"{label:<12} concurrency={concurrency:<3} "
+                    f"{r['throughput']:.0f} req/s  loop lag "
+                    f"p50={r['lag_p50']:.2f}ms p99={r['lag_p99']:.2f}ms max={r['lag_max']:.2f}ms"
+                )
+        await POSTGIS_ASYNC_ENGINE.dispose()
+
+    asyncio.run(_main())
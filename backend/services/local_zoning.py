@@ -0,0 +1,362 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import pyarrow as pa
+import shapely
+
+from database.snapshot import BBOX_COLUMN, GEOMETRY_COLUMN, open_snapshot
+
+
+@dataclass
+class LayerIndex:
+    """
+    單一圖層的記憶體內空間索引（STRtree + prepared geometry）
+    """
+    geometries: np.ndarray  # 由快照載入時初始為 None，查詢命中時才解碼
+    tree: shapely.STRtree
+    attributes: dict[str, list]  # 欄位 ➜ 與 geometries 對齊的值
+    attribute_codes: np.ndarray  # 屬性組合編號，相同屬性的圖徵編號相同
+    wkb: Optional[pa.ChunkedArray] = None  # 快照中 memory map 的 WKB 欄位
+
+    @classmethod
+    def load(cls, layer: str, file_path: str, columns: dict[str, str] = None) -> "LayerIndex":
+        """
+        優先由欄式快照載入（見 database/snapshot.py），快照不存在或過期時讀取來源檔
+        :param layer: 圖層名稱（小寫表名）
+        """
+        snapshot = open_snapshot(layer, file_path)
+        if snapshot is not None:
+            return cls.from_snapshot(snapshot, columns)
+        print(f"{layer} 快照不存在或已過期，改為讀取 {file_path}")
+        return cls.from_file(file_path, columns)
+
+    @classmethod
+    def from_file(cls, file_path: str, columns: dict[str, str] = None) -> "LayerIndex":
+        """
+        :param file_path: 地理檔案路徑
+        :param columns: 輸出名稱 ➜ 來源欄位（小寫，與資料庫一致）
+        """
+        df = gpd.read_file(file_path)
+        df.columns = [col.lower() for col in df.columns]  # 欄位全小寫
+        if df.crs is not None and df.crs.to_epsg() != 4326:
+            df = df.to_crs(epsg=4326)
+        df = df[df.geometry.notna()]
+
+        geometries = np.asarray(df.geometry.values, dtype=object)
+        # 預先 prepare，之後的包含判斷可重複使用
+        shapely.prepare(geometries)
+
+        attributes = {
+            name: df[source].tolist()
+            for name, source in (columns or {}).items()
+        }
+
+        return cls(
+            geometries=geometries,
+            tree=shapely.STRtree(geometries),
+            attributes=attributes,
+            attribute_codes=_attribute_codes(attributes, len(geometries)),
+        )
+
+    @classmethod
+    def from_snapshot(cls, table: pa.Table, columns: dict[str, str] = None) -> "LayerIndex":
+        """
+        以快照預先算好的 bbox 建立 STRtree，不解碼任何多邊形；
+        WKB 留在 memory map 中，查詢命中候選時才解碼並 prepare
+        :param table: open_snapshot 回傳的 Arrow Table
+        :param columns: 輸出名稱 ➜ 來源欄位（小寫）
+        """
+        bbox = table.column(BBOX_COLUMN).combine_chunks()
+        xmin, ymin, xmax, ymax = (
+            bbox.field(key).to_numpy(zero_copy_only=False)
+            for key in ("xmin", "ymin", "xmax", "ymax")
+        )
+        boxes = shapely.box(xmin, ymin, xmax, ymax)
+        # 空幾何的 bbox 為 NaN，以 None 佔位使索引仍與列對齊
+        boxes[np.isnan(xmin)] = None
+
+        attributes = {
+            name: table.column(source).to_pylist()
+            for name, source in (columns or {}).items()
+        }
+
+        return cls(
+            geometries=np.full(table.num_rows, None, dtype=object),
+            tree=shapely.STRtree(boxes),
+            attributes=attributes,
+            attribute_codes=_attribute_codes(attributes, table.num_rows),
+            wkb=table.column(GEOMETRY_COLUMN),
+        )
+
+    def _geometries_at(self, idx: np.ndarray) -> np.ndarray:
+        """
+        取得指定索引的幾何；由快照載入時，尚未解碼者在此解碼並保留供之後重複使用
+        （多執行緒同時解碼同一圖徵只會重複寫入相同的值，不需加鎖）
+        """
+        geoms = self.geometries[idx]
+        if self.wkb is None:
+            return geoms
+        missing = shapely.is_missing(geoms)
+        if missing.any():
+            todo = np.unique(idx[missing])
+            decoded = shapely.from_wkb(
+                self.wkb.take(pa.array(todo)).to_numpy(zero_copy_only=False))
+            shapely.prepare(decoded)
+            self.geometries[todo] = decoded
+            geoms = self.geometries[idx]
+        return geoms
+
+    def first_hit(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """
+        向量化查詢每個點所在的圖徵
+        :return: 每個點命中的圖徵索引，未命中為 -1
+        """
+        hits = np.full(len(x), -1, dtype=np.intp)
+        if len(x) == 0:
+            return hits
+
+        # 先以外框篩選候選，再對候選做精確判斷
+        inp, cand = self.tree.query(shapely.points(x, y))
+        if len(inp) == 0:
+            return hits
+        ok = shapely.intersects_xy(self._geometries_at(cand), x[inp], y[inp])
+        inp, cand = inp[ok], cand[ok]
+
+        # 同一點命中多個圖徵時取索引最小者，結果穩定
+        order = np.lexsort((cand, inp))
+        inp, cand = inp[order], cand[order]
+        _, first = np.unique(inp, return_index=True)
+        hits[inp[first]] = cand[first]
+        return hits
+
+    def cell_state(self, boxes: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        判斷每個格網與圖層的關係
+        :return: (是否與任一圖徵相交, 是否被某一圖徵完全覆蓋, 相交圖徵的屬性組合數)
+        """
+        n = len(boxes)
+        touch = np.zeros(n, dtype=bool)
+        covered = np.zeros(n, dtype=bool)
+        kinds = np.zeros(n, dtype=np.intp)
+
+        # 樹中可能只有外框（快照），因此不用 predicate，另對候選做精確判斷
+        inp, cand = self.tree.query(boxes)
+        if len(inp) == 0:
+            return touch, covered, kinds
+        geoms = self._geometries_at(cand)
+        ok = shapely.intersects(geoms, boxes[inp])
+        inp, cand, geoms = inp[ok], cand[ok], geoms[ok]
+        if len(inp) == 0:
+            return touch, covered, kinds
+
+        touch[inp] = True
+        cov = shapely.covers(geoms, boxes[inp])
+        covered[inp[cov]] = True
+        pairs = np.unique(np.stack([inp, self.attribute_codes[cand]]), axis=1)
+        kinds = np.bincount(pairs[0], minlength=n)
+        return touch, covered, kinds
+
+
+def _attribute_codes(attributes: dict[str, list], n: int) -> np.ndarray:
+    # 以 repr 比對屬性組合，NaN 也能視為相同
+    attribute_keys = [repr(key) for key in zip(*attributes.values())] \
+        if attributes else [""] * n
+    attribute_codes, _ = pd.factorize(pd.Series(attribute_keys, dtype=object))
+    return np.asarray(attribute_codes)
+
+
+class LocalZoningEngine:
+    """
+    於程序內以 STRtree 回答使用分區與公有地查詢，不需連線資料庫。
+    回傳的每列與 services.intersect 的 SQL 查詢結果欄位相同。
+    """
+
+    def __init__(self, taipei: LayerIndex, taiwan: LayerIndex, public: LayerIndex):
+        self.taipei = taipei
+        self.taiwan = taiwan
+        self.public = public
+
+    @classmethod
+    def from_files(
+            cls,
+            geo_files: dict[str, str],
+            zone_columns: dict[str, tuple[str, str, str]]
+    ) -> "LocalZoningEngine":
+        """
+        :param geo_files: 圖層名稱 ➜ 檔案路徑（即 GEO_FILES）
+        :param zone_columns: 分區圖層名稱 ➜ (zone, far, bcr) 欄位
+        """
+        def columns_of(layer: str) -> dict[str, str]:
+            return dict(zip(("zone", "far", "bcr"), zone_columns[layer]))
+
+        return cls(
+            taipei=LayerIndex.load(
+                "taipei_landuse", geo_files["TAIPEI_LANDUSE"], columns_of("TAIPEI_LANDUSE")),
+            taiwan=LayerIndex.load(
+                "taiwan_landuse", geo_files["TAIWAN_LANDUSE"], columns_of("TAIWAN_LANDUSE")),
+            public=LayerIndex.load("public_land", geo_files["PUBLIC_LAND"]),
+        )
+
+    def query(self, lngs: list[float], lats: list[float]) -> list[dict]:
+        x = np.asarray(lngs, dtype=float)
+        y = np.asarray(lats, dtype=float)
+
+        tp_hits = self.taipei.first_hit(x, y)
+        # 台北查無時才查全台
+        tw_hits = np.full(len(x), -1, dtype=np.intp)
+        need = np.flatnonzero(tp_hits < 0)
+        tw_hits[need] = self.taiwan.first_hit(x[need], y[need])
+        pub_hits = self.public.first_hit(x, y)
+
+        rows = []
+        for i in range(len(x)):
+            row = {"ord": i, "is_public": bool(pub_hits[i] >= 0)}
+            for prefix, layer, hits in (("tp", self.taipei, tp_hits), ("tw", self.taiwan, tw_hits)):
+                j = hits[i]
+                row[f"{prefix}_hit"] = True if j >= 0 else None
+                for key in ("zone", "far", "bcr"):
+                    row[f"{prefix}_{key}"] = layer.attributes[key][j] if j >= 0 else None
+            rows.append(row)
+        return rows
+
+    def classify_cells(self, bounds: list[tuple[float, float, float, float]]) -> list[bool]:
+        """
+        判斷每個格網內所有點的查詢結果是否必定相同（可快取）
+        :param bounds: 每個格網的 (xmin, ymin, xmax, ymax)
+        """
+        if not bounds:
+            return []
+        xmin, ymin, xmax, ymax = (np.asarray(v, dtype=float) for v in zip(*bounds))
+        boxes = shapely.box(xmin, ymin, xmax, ymax)
+
+        tp_touch, tp_cov, tp_kinds = self.taipei.cell_state(boxes)
+        tw_touch, tw_cov, tw_kinds = self.taiwan.cell_state(boxes)
+        pub_touch, pub_cov, _ = self.public.cell_state(boxes)
+
+        tp_stable = ~tp_touch | (tp_cov & (tp_kinds == 1))
+        # 台北完全覆蓋時不會查全台；台北完全未相交時才看全台
+        tw_stable = tp_touch | ~tw_touch | (tw_cov & (tw_kinds == 1))
+        pub_stable = ~pub_touch | pub_cov
+        return (tp_stable & tw_stable & pub_stable).tolist()
+
+
+_engine: LocalZoningEngine = None
+_engine_lock = threading.Lock()
+_next_load = float("-inf")  # 下次可嘗試載入的時間（time.monotonic）
+_load_failures = 0  # 連續載入失敗次數
+_RETRY_BASE_SECONDS = 60  # 載入失敗後的重試間隔，每次失敗加倍
+_RETRY_MAX_SECONDS = 3600
+
+
+def get_local_engine(
+        geo_files: dict[str, str],
+        zone_columns: dict[str, tuple[str, str, str]]
+) -> LocalZoningEngine:
+    """
+    取得（必要時建立）程序內共用的本地分區引擎；首次呼叫會讀檔建索引，應於執行緒中呼叫。
+    載入失敗後於重試間隔內直接拋出例外，避免每個請求都重新讀檔後才改用 PostGIS
+    """
+    global _engine, _next_load, _load_failures
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                if time.monotonic() < _next_load:
+                    raise RuntimeError("本地分區引擎先前載入失敗，等待重試")
+                start = time.perf_counter()
+                try:
+                    _engine = LocalZoningEngine.from_files(geo_files, zone_columns)
+                except Exception as e:
+                    _load_failures += 1
+                    delay = min(_RETRY_BASE_SECONDS * 2 ** (_load_failures - 1), _RETRY_MAX_SECONDS)
+                    _next_load = time.monotonic() + delay
+                    print(f"本地分區引擎載入失敗，{delay:.0f} 秒後重試: {e}")
+                    raise
+                _load_failures = 0
+                print(f"本地分區引擎載入完成，耗時 {time.perf_counter() - start:.1f} 秒")
+    return _engine
+
+
+# 以下供 __main__ 的 worker 啟動量測使用；spawn 出的子程序需能由模組層級取得
+def _rss_kb() -> dict[str, int]:
+    # RssAnon 為程序私有記憶體；RssFile 為檔案對應頁面，可由多個程序共用
+    usage = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("RssAnon", "RssFile"):
+                usage[key] = int(value.split()[0])
+    return usage
+
+
+def _benchmark_worker(mode: str, geo_files: dict, zone_columns: dict, results) -> None:
+    start = time.perf_counter()
+    if mode == "snapshot":
+        engine = LocalZoningEngine.from_files(geo_files, zone_columns)
+    else:
+        def columns_of(layer: str) -> dict[str, str]:
+            return dict(zip(("zone", "far", "bcr"), zone_columns[layer]))
+        engine = LocalZoningEngine(
+            taipei=LayerIndex.from_file(
+                geo_files["TAIPEI_LANDUSE"], columns_of("TAIPEI_LANDUSE")),
+            taiwan=LayerIndex.from_file(
+                geo_files["TAIWAN_LANDUSE"], columns_of("TAIWAN_LANDUSE")),
+            public=LayerIndex.from_file(geo_files["PUBLIC_LAND"]),
+        )
+    startup = time.perf_counter() - start
+
+    # 模擬暖機後的查詢，讓快照模式解碼實際會用到的圖徵
+    rng = np.random.default_rng(0)
+    engine.query(
+        rng.uniform(121.48, 121.60, 2000).tolist(),
+        rng.uniform(25.00, 25.10, 2000).tolist(),
+    )
+    results.put({"startup": startup, **_rss_kb()})
+
+
+if __name__ == "__main__":
+    # 量測每個 worker 的啟動時間與記憶體：讀取來源檔 vs. memory map 快照
+    # 於 backend 目錄下執行：python -m services.local_zoning [worker 數]
+    import multiprocessing
+    import sys
+
+    def _run(mode: str, workers: int, geo_files: dict, zone_columns: dict) -> None:
+        ctx = multiprocessing.get_context("spawn")
+        results = ctx.Queue()
+        procs = [
+            ctx.Process(target=_benchmark_worker, args=(mode, geo_files, zone_columns, results))
+            for _ in range(workers)
+        ]
+        for p in procs:
+            p.start()
+        stats = [results.get() for _ in procs]
+        for p in procs:
+            p.join()
+
+        startup = max(s["startup"] for s in stats)
+        anon = sum(s["RssAnon"] for s in stats) / 1024
+        file_backed = max(s["RssFile"] for s in stats) / 1024
+        print(
+            f"[{mode}] {workers} workers：啟動 {startup:.2f} 秒，"
+            f"私有記憶體合計 {anon:.0f} MB（平均 {anon / workers:.0f} MB），"
+            f"共用檔案頁面 {file_backed:.0f} MB"
+        )
+
+    # 以 ZONING_BACKEND=local 執行時匯入 services.intersect 不會連線資料庫
+    from database.geo_files import GEO_FILES
+    from database.manifest import content_hash, source_stat
+    from database.snapshot import snapshot_is_current, write_snapshot
+    from services.intersect import _ZONE_COLUMNS_BY_LAYER
+
+    # 直接由來源檔補寫缺少或過期的快照，不需先匯入資料庫
+    for layer_name, layer_path in GEO_FILES.items():
+        layer_stat, layer_digest = source_stat(layer_path), content_hash(layer_path)
+        if not snapshot_is_current(layer_name.lower(), layer_stat, layer_digest):
+            write_snapshot(layer_path, layer_name.lower(), layer_stat, layer_digest)
+
+    n_workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    for bench_mode in ("file", "snapshot"):
+        _run(bench_mode, n_workers, GEO_FILES, _ZONE_COLUMNS_BY_LAYER)
@@ -1,18 +1,97 @@
-from llm.llm import call_llm, ResponseMode
+from contextlib import aclosing
+from typing import Any, AsyncIterator
+
+from config.consts import (
+    LLM_CACHE_TTL_SECONDS,
+    LLM_PROMPT_COMPACTION,
+    LLM_PROMPT_POI_TOKEN_BUDGET,
+    LLM_PROMPT_POI_TOP_N,
+)
+from llm.llm import call_llm, parse_json_response, stream_llm, ResponseMode
+from llm.store import LLM_STORE, canonical_pois, llm_cache_key
+from services.poi_compaction import compact_pois
+from utils.address import normalize_address
 from utils.cache import smart_cache
+from utils.json_stream import JsonArrayItemScanner
+
+# 修改提示詞時遞增，使快取中的舊結果失效
+PROMPT_VERSION = 1
+
 
+def _cache_key(data) -> str:
+    """
+    只以提示詞用到的欄位組成快取鍵：標準化地址與排序、距離取整後的 POI，以及彙總設定（影響提示詞內容）
+    """
+    return llm_cache_key(PROMPT_VERSION, {
+        "address": normalize_address(data.get("address")),
+        "nearby_poi": canonical_pois(data.get("nearby_poi")),
+        "compaction": [LLM_PROMPT_POI_TOP_N, LLM_PROMPT_POI_TOKEN_BUDGET] if LLM_PROMPT_COMPACTION else None,
+    })
 
-@smart_cache()
+
+@smart_cache(key_func=_cache_key, store=LLM_STORE, store_ttl=LLM_CACHE_TTL_SECONDS)
 async def llm_nearby_analysis(data) -> dict | None:
+    result = None
+    try:
+        result = await call_llm(
+            _nearby_analysis_prompt(data),
+            response_mode=ResponseMode.DICT
+        )
+    except Exception as e:
+        raise e
+
+    return result
+
+
+async def stream_nearby_analysis(data) -> AsyncIterator[tuple[str, Any]]:
+    """
+    串流版的 llm_nearby_analysis，與其共用快取及進行中的生成（相同輸入同時請求只呼叫一次 LLM）
+    :return: 依序產生 ("analysis", 單一 poi_type 的分析) 與最後的 ("result", 完整結果)
+    """
+    scanner = JsonArrayItemScanner()
+    streamed = False
+    stream = llm_nearby_analysis.cache_stream(
+        lambda: stream_llm(_nearby_analysis_prompt(data)),
+        lambda chunks: parse_json_response("".join(chunks)),
+        data,
+    )
+    # 呼叫端提前停止時立即離開共用的生成；所有請求都離開時才關閉 LLM 串流、釋放名額
+    async with aclosing(stream):
+        async for kind, value in stream:
+            if kind == "chunk":
+                streamed = True
+                for key, item in scanner.feed(value):
+                    if key == "analysis":
+                        yield "analysis", item
+                continue
+            # 命中快取或共用一般呼叫的結果時，由完整結果逐項送出
+            if not streamed and value:
+                for item in value.get("analysis", []):
+                    yield "analysis", item
+            yield "result", value
+
+
+def _nearby_analysis_prompt(data, compaction: bool = LLM_PROMPT_COMPACTION) -> str:
+    """
+    :param compaction: 是否先將 POI 彙總為各類別統計（大幅減少輸入 token）；False 時直接放入原始 POI 列表
+    """
     poi_types = ["餐飲", "醫療", "公共設施"]
+    if compaction:
+        poi_text = compact_pois(data.get('nearby_poi'), LLM_PROMPT_POI_TOP_N, LLM_PROMPT_POI_TOKEN_BUDGET)
+        poi_description = (f"以上為各類別POI的彙總，距離皆為與「{data.get('address')}」的距離（公尺），"
+                           "括號內數字為該POI的距離。")
+    else:
+        poi_text = data.get('nearby_poi')
+        poi_description = (f"其中，`distance`表示該POI距離「{data.get('address')}」的距離，"
+                           f"`name`表示POI名稱，`poi_type`表示POI類型。")
     prompt = f"""
 以下是「{data.get('address')}」的周邊POI資料，請針對{poi_types}等方面進行分析，總結其在這些方面的優勢和劣勢。
 以簡潔明瞭的方式總結該地區生活機能特點，並比較不同生活機能類別之間的差異。
 
 poi資料：
-{data.get('nearby_poi')}
+{poi_text}
 
-其中，`distance`表示該POI距離「{data.get('address')}」的距離，`name`表示POI名稱，`poi_type`表示POI類型。
+{poi_description}
 
 請以JSON格式回傳分析結果，格式如下：
 ```json
@@ -38,13 +117,4 @@ poi資料：
     3. 僅針對POI類別進行分析，而不是個別POI。
 - 違反以上規則將導致重大損失。
 """
-    result = None
-    try:
-        result = call_llm(
-            prompt,
-            response_mode=ResponseMode.DICT
-        )
-    except Exception as e:
-        raise e
-
-    return result
+    return prompt
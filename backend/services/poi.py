@@ -1,11 +1,39 @@
-import pandas as pd
 import geopandas as gpd
+import pandas as pd
 import asyncio
 from osmnx.features import features_from_polygon
 from osmnx._errors import InsufficientResponseError
-from shapely.geometry import Point
 
+from config.consts import (
+    POI_BACKEND,
+    POI_TILE_MAX_TILES,
+    POI_TILE_TTL_SECONDS,
+    POI_TILE_ZOOM,
+)
+from services import poi_store
+from services.poi_tiles import PoiTileCache, split_by_tile, tiles_covering, tiles_polygon
 from structs.adress_point import Coordinates
+from utils.geo import distance_m, geodesic_buffer, representative_xy
+from utils.singleflight import SingleFlight
+
+
+# POI 類別 ➜ OSM amenity 標籤
+POI_TYPES = {
+    'food': ['restaurant', 'cafe', 'fast_food'],
+    'health': ['hospital', 'clinic', 'pharmacy'],
+    'public': ['park', 'library', 'community_centre'],
+}
+_AMENITY_CATEGORY = {
+    amenity: category
+    for category, amenities in POI_TYPES.items()
+    for amenity in amenities
+}
+_CATEGORY_ORDER = {category: i for i, category in enumerate(POI_TYPES)}
+
+# Overpass 查詢結果以固定圖磚快取，相鄰地址的查詢可共用
+POI_TILE_CACHE = PoiTileCache(
+    zoom=POI_TILE_ZOOM, ttl=POI_TILE_TTL_SECONDS, max_tiles=POI_TILE_MAX_TILES)
+_tile_inflight = SingleFlight()
 
 
 async def get_nearby_poi(coordinates: Coordinates, distance: int = 500) -> gpd.GeoDataFrame:
@@ -15,120 +43,128 @@ async def get_nearby_poi(coordinates: Coordinates, distance: int = 500) -> gpd.G
     :param distance: 距離 (公尺)
     :return: POI GeoDataFrame
     """
-    # 1. 建立緩衝區
-    polygon_ll = await _create_buffer_polygon(coordinates, distance)
+    if POI_BACKEND == "local":
+        # 本地資料表尚未同步完成或查詢失敗時，改用 Overpass
+        poi_store.schedule_refresh(_AMENITY_CATEGORY)
+        if poi_store.is_ready():
+            try:
+                return await poi_store.query_nearby_poi(coordinates, distance)
+            except Exception as e:
+                print(f"查詢本地 POI 失敗，改用 Overpass: {e}")
+
+    # 1. 建立緩衝區（直接以經緯度計算，不需投影）
+    polygon_ll = geodesic_buffer(coordinates.lng, coordinates.lat, distance)
 
     # 2. 查詢所有POI
     all_poi = await _fetch_all_poi_types(polygon_ll)
 
-    # 3. 計算每個POI到輸入座標的距離
+    # 3. 計算每個POI到輸入座標的距離（線、面以代表點計算，單位：公尺）
     if not all_poi.empty:
-        # 建立輸入座標點
-        input_point = Point(coordinates.lng, coordinates.lat)
-
-        # 建立包含輸入點的GeoDataFrame
-        input_gdf = gpd.GeoDataFrame(geometry=[input_point], crs="EPSG:4326")
-
-        # 投影到Web Mercator以計算精確距離（單位：公尺）
-        proj_input = input_gdf.to_crs(epsg=3857)
-        proj_poi = all_poi.to_crs(epsg=3857)
-
-        # 計算每個POI到輸入點的距離
-        all_poi['distance'] = proj_poi.geometry.distance(
-            proj_input.geometry.iloc[0])
-
-        # 將GeoDataFrame轉回WGS84
-        all_poi = all_poi.to_crs(epsg=4326)
+        x, y = representative_xy(all_poi.geometry.values)
+        all_poi['distance'] = distance_m(coordinates.lng, coordinates.lat, x, y)
 
     return all_poi
 
 
-async def _create_buffer_polygon(coordinates: Coordinates, distance: int) -> gpd.GeoSeries:
-    """
-    建立座標點並計算緩衝區
-    :param coordinates: 座標點
-    :param distance: 緩衝區距離 (公尺)
-    :return: 緩衝區多邊形 (經緯度坐標系)
-    """
-    # 建立 GeoDataFrame (WGS84)
-    gdf = gpd.GeoDataFrame(
-        [{'latitude': coordinates.lat, 'longitude': coordinates.lng}],
-        geometry=gpd.points_from_xy([coordinates.lng], [coordinates.lat]),
-        crs='EPSG:4326'
-    )
-
-    # 投影至公尺座標系計算緩衆區，再轉回經緯度
-    buffer = gdf.to_crs(epsg=3857).buffer(distance).to_crs(epsg=4326)
-
-    return buffer.iloc[0]
-
-
 async def _fetch_all_poi_types(polygon_ll) -> gpd.GeoDataFrame:
     """
-    並行查詢所有類型的POI並合併結果
+    由覆蓋緩衝區的固定圖磚組合POI：已快取的圖磚直接使用，
+    其餘圖磚以單一 Overpass 查詢取得後於本地依 amenity 分類並寫入快取
     :param polygon_ll: 緩衝區多邊形
-    :return: 合併後的POI GeoDataFrame
+    :return: 與緩衝區相交的POI GeoDataFrame
+    """
+    tiles = tiles_covering(polygon_ll.bounds, POI_TILE_CACHE.zoom)
+    found, missing = POI_TILE_CACHE.get_many(tiles)
+    if missing:
+        # 同時請求相同的缺少圖磚時只查詢一次
+        found.update(await _tile_inflight.do(
+            tuple(sorted(missing)), lambda: _fetch_tiles(missing)))
+
+    frames = [found[tile] for tile in tiles if not found[tile].empty]
+    if not frames:
+        return _empty_poi_frame().drop(columns='osm_id')
+
+    poi = gpd.GeoDataFrame(pd.concat(frames, ignore_index=True), crs=frames[0].crs)
+    # 跨越多個圖磚的圖徵在每個圖磚中各有一份
+    poi = poi.drop_duplicates(subset='osm_id').drop(columns='osm_id')
+    poi = poi[poi.intersects(polygon_ll)].dropna(subset=['name'])
+    # 依類別排序，與原本逐類查詢的順序一致
+    poi = poi.sort_values('poi_type', key=lambda s: s.map(_CATEGORY_ORDER), kind='stable')
+    return poi.reset_index(drop=True)
+
+
+async def _fetch_tiles(tiles: list) -> dict:
     """
-    # 定義 POI 類型
-    poi_types = {
-        'food': ['restaurant', 'cafe', 'fast_food'],
-        'health': ['hospital', 'clinic', 'pharmacy'],
-        'public': ['park', 'library', 'community_centre']
-    }
-
-    # 並行查詢所有POI類型
-    tasks = [
-        _fetch_poi_by_type(polygon_ll, category, amenities)
-        for category, amenities in poi_types.items()
-    ]
-
-    # 等待所有任務完成
-    results = await asyncio.gather(*tasks)
-
-    # 過濾掉None結果
-    poi_frames = [df for df in results if df is not None]
-
-    # 合併結果
-    if poi_frames:
-        all_poi = gpd.GeoDataFrame(
-            pd.concat(poi_frames, ignore_index=True), crs=poi_frames[0].crs)
-        return all_poi.dropna(subset=['name'])
-
-    # 返回空的GeoDataFrame
+    以一次 Overpass 查詢取得多個圖磚的POI，依外框分配到相交的各圖磚後寫入快取
+    """
+    polygon = tiles_polygon(tiles, POI_TILE_CACHE.zoom)
+    # osmnx 為同步 I/O，放到執行緒中避免阻塞 event loop
+    poi = await asyncio.to_thread(_fetch_poi_by_tags, polygon)
+    if poi is None:
+        poi = _empty_poi_frame()
+    frames = split_by_tile(poi, tiles, POI_TILE_CACHE.zoom)
+    POI_TILE_CACHE.put_many(frames)
+    return frames
+
+
+def _empty_poi_frame() -> gpd.GeoDataFrame:
     return gpd.GeoDataFrame(
         columns=[
-            'poi_type', 'geometry', 'name', 'addr:full', 'addr:city', 'addr:district'
+            'poi_type', 'geometry', 'name', 'addr:full', 'addr:city', 'addr:district', 'osm_id'
         ],
+        geometry='geometry',
         crs='EPSG:4326'
     )
 
 
-async def _fetch_poi_by_type(polygon_ll, category: str, amenities: list) -> (gpd.GeoDataFrame | None):
+def _fetch_poi_by_tags(polygon_ll) -> (gpd.GeoDataFrame | None):
     """
-    查詢特定類型的POI
+    一次查詢所有 POI 類別的 amenity 標籤並分類
     :param polygon_ll: 緩衝區多邊形
-    :param category: POI類別名稱
-    :param amenities: POI類別標籤列表
-    :return: 該類別的POI資料，查詢失敗時返回None
+    :return: POI資料，查無資料時返回None
     """
-    tags = {'amenity': amenities}
+    tags = {'amenity': list(_AMENITY_CATEGORY)}
     try:
         poi = features_from_polygon(polygon_ll, tags)
-        if poi.empty:
-            return None
+    except InsufficientResponseError:
+        return None
+    if poi.empty:
+        return None
 
-        # 處理資料
-        poi = poi.reset_index()
-        poi['poi_type'] = category
+    # 處理資料；osm_id（如 way/123）供組合圖磚時去除重複
+    poi = poi.reset_index()
+    poi['osm_id'] = poi['element'].astype(str) + '/' + poi['id'].astype(str)
+    poi['poi_type'] = poi['amenity'].map(_AMENITY_CATEGORY)
+    poi = poi[poi['poi_type'].notna()]
+    if poi.empty:
+        return None
 
-        # 確保必要欄位存在
-        for col in ['addr:full', 'addr:city', 'addr:district']:
-            if col not in poi.columns:
-                poi[col] = None
+    # 確保必要欄位存在
+    for col in ['name', 'addr:full', 'addr:city', 'addr:district']:
+        if col not in poi.columns:
+            poi[col] = None
 
-        # 選取需要的欄位
-        return poi[['poi_type', 'geometry', 'name',
-                    'addr:full', 'addr:city', 'addr:district']]
+    # 選取需要的欄位
+    return gpd.GeoDataFrame(
+        poi[['poi_type', 'geometry', 'name',
+             'addr:full', 'addr:city', 'addr:district', 'osm_id']].reset_index(drop=True),
+        crs=poi.crs,
+    )
 
-    except InsufficientResponseError:
-        return None
+
+if __name__ == "__main__":
+    # 量測 get_nearby_poi 端到端延遲（約等於一次 Overpass 往返）
+    # 於 backend 目錄下執行：python -m services.poi
+    import time
+
+    async def _main():
+        for lat, lng in [(25.0330, 121.5654), (25.0478, 121.5170), (25.0173, 121.5397)]:
+            t0 = time.perf_counter()
+            pois = await get_nearby_poi(Coordinates(lat=lat, lng=lng), distance=500)
+            print(
+                f"({lat}, {lng}) {len(pois)} 筆 POI，"
+                f"耗時 {(time.perf_counter() - t0) * 1000:.0f} ms，"
+                f"各類數量 {pois['poi_type'].value_counts().to_dict()}"
+            )
+
+    asyncio.run(_main())
@@ -0,0 +1,126 @@
+import math
+import statistics
+from typing import Any
+
+from llm.store import canonical_pois
+
+
+# poi_type ➜ 提示詞中使用的類別名稱（與 nearby_analysis 的分析類別一致）
+POI_TYPE_LABELS = {"food": "餐飲", "health": "醫療", "public": "公共設施"}
+_COUNT_RADII = (300, 500)  # 額外列出此距離內的數量（公尺）
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗估 token 數：中日韓文字約每字 1 token，其餘約每 4 字元 1 token
+    （僅用於控制提示詞長度，實際值以 Ollama 回傳的 prompt_eval_count 為準）
+    """
+    cjk = sum(1 for char in text if ord(char) >= 0x2E80)
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def compact_pois(pois: Any, top_n: int = 5, token_budget: int = 800) -> str:
+    """
+    將 POI 列表彙總為每個類別一行：數量、最近與中位數距離、特定距離內數量，以及最近的數個具名 POI
+    超過 token_budget 時逐步減少列出的 POI 數，至少保留統計資料
+    :param pois: 前端送來的 POI（GeoJSON FeatureCollection 或屬性字典列表）
+    :param top_n: 每個類別最多列出的 POI 數
+    :param token_budget: 彙總文字的估計 token 上限
+    """
+    groups: dict[str, list[tuple[float, str]]] = {label: [] for label in POI_TYPE_LABELS.values()}
+    for poi in canonical_pois(pois, distance_step=1):
+        distance = poi.get("distance")
+        if not isinstance(distance, (int, float)):
+            continue
+        label = POI_TYPE_LABELS.get(poi.get("poi_type"), poi.get("poi_type") or "其他")
+        groups.setdefault(label, []).append((distance, poi.get("name") or ""))
+    for items in groups.values():
+        items.sort()
+
+    for n in range(top_n, -1, -1):
+        text = _render(groups, n)
+        if estimate_tokens(text) <= token_budget:
+            break
+    return text
+
+
+def _render(groups: dict[str, list[tuple[float, str]]], top_n: int) -> str:
+    lines = []
+    for label, items in groups.items():
+        if not items:
+            lines.append(f"- {label}：0 處")
+            continue
+        distances = [d for d, _ in items]
+        within = "、".join(
+            f"{radius} 公尺內 {sum(d <= radius for d in distances)} 處" for radius in _COUNT_RADII)
+        line = (f"- {label}：共 {len(items)} 處；最近 {distances[0]:.0f} 公尺、"
+                f"中位數 {statistics.median(distances):.0f} 公尺；{within}")
+        examples = _nearest_names(items, top_n)
+        if examples:
+            line += "。最近的有：" + "、".join(f"{name}（{d:.0f}）" for d, name in examples)
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def _nearest_names(items: list[tuple[float, str]], top_n: int) -> list[tuple[float, str]]:
+    """
+    由近到遠取不重複名稱的 POI（連鎖店只列最近一間）
+    """
+    seen = set()
+    examples = []
+    for distance, name in items:
+        if len(examples) >= top_n:
+            break
+        if name and name not in seen:
+            seen.add(name)
+            examples.append((distance, name))
+    return examples
+
+
+if __name__ == "__main__":
+    # 比較原始與彙總後的 POI 提示詞長度；加上 --llm 時實際呼叫 Ollama 比較 prompt token 與延遲
+    # 於 backend 目錄下執行：python -m services.poi_compaction [--llm]
+    import asyncio
+    import random
+    import sys
+    import time
+
+    random.seed(0)
+
+    def sample(n: int) -> dict:
+        return {"type": "FeatureCollection", "features": [{
+            "type": "Feature",
+            "properties": {
+                "poi_type": random.choice(list(POI_TYPE_LABELS)),
+                "name": f"{random.choice(['好味', '仁愛', '大安', '信義', '健康'])}"
+                        f"{random.choice(['餐廳', '咖啡', '診所', '藥局', '公園', '圖書館'])}{i % 40}",
+                "addr:full": None, "addr:city": None, "addr:district": None,
+                "distance": random.uniform(20, 500),
+            },
+            "geometry": {"type": "Point", "coordinates": [
+                121.5654 + random.uniform(-0.005, 0.005), 25.0330 + random.uniform(-0.005, 0.005)]},
+        } for i in range(n)]}
+
+    for n in (20, 100, 300):
+        pois = sample(n)
+        raw = str(pois)
+        compact = compact_pois(pois)
+        print(f"{n:>4} 筆 POI：原始約 {estimate_tokens(raw):>6} tokens，彙總後約 {estimate_tokens(compact):>4} tokens")
+    print(compact)
+
+    if "--llm" in sys.argv:
+        from llm.llm import call_llm, ResponseMode
+        from services.nearby_analysis import _nearby_analysis_prompt
+
+        async def _measure() -> None:
+            data = {"address": "台北市信義區松高路12號", "nearby_poi": sample(300)}
+            for compaction in (False, True):
+                t0 = time.perf_counter()
+                response = await call_llm(
+                    _nearby_analysis_prompt(data, compaction=compaction), response_mode=ResponseMode.RAW)
+                metadata = response.response_metadata
+                print(f"compaction={compaction}：prompt {metadata.get('prompt_eval_count')} tokens，"
+                      f"prefill {(metadata.get('prompt_eval_duration') or 0) / 1e9:.1f} 秒，"
+                      f"總計 {time.perf_counter() - t0:.1f} 秒")
+
+        asyncio.run(_measure())
@@ -0,0 +1,56 @@
+import math
+import numpy as np
+import geopandas as gpd
+
+from structs.poi_rings import PoiTypeRings, RingStats
+
+
+def compute_ring_stats(
+        pois: gpd.GeoDataFrame,
+        radii: list[int],
+        poi_types: list[str]
+) -> list[PoiTypeRings]:
+    """
+    一次向量化計算各 poi_type 在每個半徑內的數量、環帶數量、密度與最近距離
+    :param pois: get_nearby_poi 的結果（需含 poi_type 與 distance）
+    :param radii: 由小到大的半徑（公尺）
+    :param poi_types: 要輸出的類別（沒有 POI 的類別也會輸出 0）
+    """
+    n_types, n_rings = len(poi_types), len(radii)
+    counts = np.zeros((n_types, n_rings), dtype=np.int64)
+    nearest = np.full(n_types, np.inf)
+
+    if not pois.empty:
+        type_index = {poi_type: i for i, poi_type in enumerate(poi_types)}
+        types = pois["poi_type"].map(type_index).to_numpy()
+        dist = pois["distance"].to_numpy(dtype=float)
+        keep = ~np.isnan(types.astype(float)) & (dist <= radii[-1])
+        types, dist = types[keep].astype(np.intp), dist[keep]
+
+        # 每個 POI 所屬的環帶：距離 <= radii[k] 的最小 k
+        rings = np.searchsorted(radii, dist, side="left")
+        counts = np.bincount(
+            types * n_rings + rings, minlength=n_types * n_rings
+        ).reshape(n_types, n_rings)
+        np.minimum.at(nearest, types, dist)
+
+    cumulative = np.cumsum(counts, axis=1)
+    areas_km2 = np.array([math.pi * r * r / 1e6 for r in radii])
+    densities = cumulative / areas_km2
+
+    return [
+        PoiTypeRings(
+            poi_type=poi_type,
+            nearest_distance=round(float(nearest[i]), 1) if np.isfinite(nearest[i]) else None,
+            rings=[
+                RingStats(
+                    radius=radii[k],
+                    count=int(cumulative[i, k]),
+                    ring_count=int(counts[i, k]),
+                    density=round(float(densities[i, k]), 2),
+                )
+                for k in range(n_rings)
+            ],
+        )
+        for i, poi_type in enumerate(poi_types)
+    ]
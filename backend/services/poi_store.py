@@ -0,0 +1,85 @@
+import asyncio
+import time
+import geopandas as gpd
+import pandas as pd
+import shapely
+from sqlalchemy import text
+
+from config.consts import POI_PBF_PATH, POI_PBF_URL, POI_REFRESH_SECONDS
+from database.connect import POSTGIS_ASYNC_ENGINE
+from database.osm_poi import OSM_POI_TABLE, POI_COLUMNS, refresh_osm_poi
+from structs.adress_point import Coordinates
+
+
+# 以 geography 計算實際距離（公尺）；ORDER BY <-> 走 KNN 索引，由近到遠
+_NEARBY_SQL = text(f"""
+    SELECT
+        poi_type, name, "addr:full", "addr:city", "addr:district",
+        ST_AsBinary(geometry) AS wkb,
+        ST_Distance(CAST(geometry AS geography), p.pt) AS distance
+    FROM {OSM_POI_TABLE},
+        (SELECT CAST(ST_SetSRID(ST_MakePoint(:lng, :lat), 4326) AS geography) AS pt) AS p
+    WHERE ST_DWithin(CAST(geometry AS geography), p.pt, :distance)
+    ORDER BY CAST(geometry AS geography) <-> p.pt
+""")
+
+_store_ready = False
+_next_refresh = float("-inf")  # 下次可同步的時間（time.monotonic）
+_refresh_failures = 0  # 連續同步失敗次數
+_RETRY_BASE_SECONDS = 60  # 同步失敗後的重試間隔，每次失敗加倍，最長 POI_REFRESH_SECONDS
+_refresh_task: asyncio.Task = None
+
+
+def is_ready() -> bool:
+    """
+    本地 POI 資料表是否已可查詢（至少完成一次同步）
+    """
+    return _store_ready
+
+
+def schedule_refresh(amenity_category: dict[str, str]) -> None:
+    """
+    依 POI_REFRESH_SECONDS 週期於背景同步本地 POI 資料表；首次呼叫即觸發
+    同步失敗時以指數退避重試，不會等到下一個週期
+    """
+    global _refresh_task
+    if time.monotonic() < _next_refresh:
+        return
+    if _refresh_task is not None and not _refresh_task.done():
+        return
+    _refresh_task = asyncio.create_task(_refresh(amenity_category))
+
+
+async def _refresh(amenity_category: dict[str, str]) -> None:
+    global _store_ready, _next_refresh, _refresh_failures
+    try:
+        await asyncio.to_thread(
+            refresh_osm_poi, POI_PBF_PATH, amenity_category, POI_PBF_URL, POI_REFRESH_SECONDS)
+    except Exception as e:
+        _refresh_failures += 1
+        delay = min(_RETRY_BASE_SECONDS * 2 ** (_refresh_failures - 1), POI_REFRESH_SECONDS)
+        _next_refresh = time.monotonic() + delay
+        print(f"更新本地 POI 資料時發生錯誤，{delay:.0f} 秒後重試: {e}")
+        return
+    _store_ready = True
+    _refresh_failures = 0
+    _next_refresh = time.monotonic() + POI_REFRESH_SECONDS
+
+
+async def query_nearby_poi(coordinates: Coordinates, distance: int) -> gpd.GeoDataFrame:
+    """
+    查詢本地 POI 資料表中距離座標 distance 公尺內的 POI
+    :return: 與 Overpass 路徑相同欄位的 GeoDataFrame，另含 distance（公尺）
+    """
+    async with POSTGIS_ASYNC_ENGINE.connect() as conn:
+        result = await conn.execute(
+            _NEARBY_SQL,
+            {"lng": coordinates.lng, "lat": coordinates.lat, "distance": distance},
+        )
+        rows = result.mappings().all()
+
+    df = pd.DataFrame(rows, columns=POI_COLUMNS + ["wkb", "distance"])
+    geometry = shapely.from_wkb(df.pop("wkb").tolist()) if len(df) else []
+    poi = gpd.GeoDataFrame(df, geometry=list(geometry), crs="EPSG:4326")
+    return poi[["poi_type", "geometry", "name",
+                "addr:full", "addr:city", "addr:district", "distance"]]
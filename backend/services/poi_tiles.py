@@ -0,0 +1,121 @@
+import math
+import time
+from collections import OrderedDict
+import geopandas as gpd
+import shapely
+
+
+Tile = tuple[int, int]
+
+
+def tile_of(lng: float, lat: float, zoom: int) -> Tile:
+    """
+    經緯度所在的 slippy map 圖磚 (x, y)
+    """
+    n = 2 ** zoom
+    x = int((lng + 180.0) / 360.0 * n)
+    lat_rad = math.radians(lat)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_bounds(tile: Tile, zoom: int) -> tuple[float, float, float, float]:
+    """
+    :return: (west, south, east, north)
+    """
+    x, y = tile
+    n = 2 ** zoom
+
+    def lat_of(row: int) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360.0 - 180.0, lat_of(y + 1), (x + 1) / n * 360.0 - 180.0, lat_of(y)
+
+
+def tiles_covering(bounds: tuple[float, float, float, float], zoom: int) -> list[Tile]:
+    """
+    :param bounds: (west, south, east, north)
+    :return: 覆蓋範圍的所有圖磚
+    """
+    west, south, east, north = bounds
+    x0, y0 = tile_of(west, north, zoom)
+    x1, y1 = tile_of(east, south, zoom)
+    return [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+
+def split_by_tile(poi: gpd.GeoDataFrame, tiles: list[Tile], zoom: int) -> dict[Tile, gpd.GeoDataFrame]:
+    """
+    將圖徵分配到其外框相交的每個圖磚：跨越多個圖磚的大型面（公園、校園、醫院）
+    在每個相交圖磚中都有一份，組合多個圖磚時需依 OSM id 去除重複
+    :return: 每個指定圖磚的圖徵（無圖徵者為空表）
+    """
+    bounds = poi.geometry.bounds
+    frames = {}
+    for tile in tiles:
+        west, south, east, north = tile_bounds(tile, zoom)
+        inside = (
+            (bounds["minx"] <= east) & (bounds["maxx"] >= west)
+            & (bounds["miny"] <= north) & (bounds["maxy"] >= south)
+        )
+        frames[tile] = poi[inside]
+    return frames
+
+
+def tiles_polygon(tiles: list[Tile], zoom: int):
+    """
+    多個圖磚合併後的範圍，供單次查詢使用
+    """
+    return shapely.union_all([shapely.box(*tile_bounds(tile, zoom)) for tile in tiles])
+
+
+class PoiTileCache:
+    """
+    以固定圖磚為單位的 POI 快取：每個圖磚存放外框與其相交的 POI（可能為空表），
+    超過 ttl 秒視為過期；超過 max_tiles 時淘汰最久未使用的圖磚。
+    僅在 event loop 中使用，不需加鎖。
+    """
+
+    def __init__(self, zoom: int = 16, ttl: float = 86400, max_tiles: int = 5000):
+        self.zoom = zoom
+        self.ttl = ttl
+        self.max_tiles = max_tiles
+        self.tiles: OrderedDict[Tile, tuple[float, gpd.GeoDataFrame]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, tiles: list[Tile]) -> tuple[dict[Tile, gpd.GeoDataFrame], list[Tile]]:
+        """
+        :return: (已快取的圖磚, 需要查詢的圖磚)
+        """
+        found = {}
+        missing = []
+        now = time.monotonic()
+        for tile in tiles:
+            entry = self.tiles.get(tile)
+            if entry is None or now - entry[0] > self.ttl:
+                self.misses += 1
+                missing.append(tile)
+                continue
+            self.hits += 1
+            self.tiles.move_to_end(tile)
+            found[tile] = entry[1]
+        return found, missing
+
+    def put_many(self, frames: dict[Tile, gpd.GeoDataFrame]) -> None:
+        now = time.monotonic()
+        for tile, frame in frames.items():
+            self.tiles[tile] = (now, frame)
+            self.tiles.move_to_end(tile)
+        while len(self.tiles) > self.max_tiles:
+            self.tiles.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "tiles": len(self.tiles),
+            "max_tiles": self.max_tiles,
+            "zoom": self.zoom,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
@@ -1,9 +1,99 @@
-from llm.llm import call_llm, ResponseMode
+from contextlib import aclosing
+from typing import AsyncIterator
+
+from config.consts import LLM_CACHE_TTL_SECONDS
+from llm.llm import call_llm, stream_llm, ResponseMode
+from llm.store import LLM_STORE, canonicalize, llm_cache_key
+from utils.address import normalize_address
 from utils.cache import smart_cache
 
+_FENCES = ("```html", "```")
+
+# 修改提示詞時遞增，使快取中的舊結果失效
+PROMPT_VERSION = 1
+
+
+def _cache_key(data: list[dict]) -> str:
+    """
+    只以提示詞用到的欄位組成快取鍵（不含 nearby_poi）；地點順序會影響提示詞內容，因此保留
+    """
+    return llm_cache_key(PROMPT_VERSION, [
+        {
+            **canonicalize({k: v for k, v in point.items() if k not in ("address", "nearby_poi")}),
+            "address": normalize_address(point.get("address")),
+        }
+        for point in data
+    ])
 
-@smart_cache()
+
+@smart_cache(key_func=_cache_key, store=LLM_STORE, store_ttl=LLM_CACHE_TTL_SECONDS)
 async def llm_compare_points(data: list[dict]) -> str | None:
+    result = None
+    try:
+        result = await call_llm(
+            _compare_points_prompt(data),
+            response_mode=ResponseMode.STRING
+        )
+    except Exception as e:
+        raise e
+
+    return result
+
+
+async def stream_compare_points(data: list[dict]) -> AsyncIterator[str]:
+    """
+    串流版的 llm_compare_points，與其共用快取（快取存放未處理的完整回應）及進行中的生成
+    （相同輸入同時請求只呼叫一次 LLM）
+    :return: 逐段產生已去除 ``` 標記的 HTML 文字
+    """
+    streamed = False
+    pending = ""
+    stream = llm_compare_points.cache_stream(
+        lambda: stream_llm(_compare_points_prompt(data)),
+        "".join,
+        data,
+    )
+    # 呼叫端提前停止時立即離開共用的生成；所有請求都離開時才關閉 LLM 串流、釋放名額
+    async with aclosing(stream):
+        async for kind, value in stream:
+            if kind == "chunk":
+                streamed = True
+                pending = strip_fences(pending + value, complete=False)
+                # 結尾可能是被切開的 ```html，先保留到下一段再輸出
+                keep = _partial_fence_length(pending)
+                if len(pending) > keep:
+                    yield pending[:len(pending) - keep]
+                    pending = pending[len(pending) - keep:]
+            elif not streamed and value:
+                # 命中快取或共用一般呼叫的結果
+                yield strip_fences(value)
+    if pending := strip_fences(pending):
+        yield pending
+
+
+def strip_fences(text: str, complete: bool = True) -> str:
+    """
+    去除 LLM 回應中多餘的 ```html 與 ``` 標記
+    :param complete: 文字是否已完整；串流中途結尾的 ``` 可能是 ```html 的開頭，先保留
+    """
+    text = text.replace(_FENCES[0], "")
+    if complete:
+        return text.replace(_FENCES[1], "")
+    keep = _partial_fence_length(text)
+    return text[:len(text) - keep].replace(_FENCES[1], "") + text[len(text) - keep:]
+
+
+def _partial_fence_length(text: str) -> int:
+    """
+    結尾與 ```html 開頭相同的最長長度
+    """
+    for length in range(min(len(_FENCES[0]) - 1, len(text)), 0, -1):
+        if _FENCES[0].startswith(text[-length:]):
+            return length
+    return 0
+
+
+def _compare_points_prompt(data: list[dict]) -> str:
     aspect_to_be_compared = ['使用分區', '容積率', '建蔽率', '是否為公有地', '周邊POI']
     points_data_str = ""
     for i, point_data in enumerate(data, start=1):
@@ -28,13 +118,4 @@ async def llm_compare_points(data: list[dict]) -> str | None:
 - 僅根據提供的資料內容進行分析，不得評論資料本身是否完整、缺乏或不足，例如「沒有資料」「資料不完整」「地址資訊不完整」「無法分析」等說法一律禁止。
 - 違反以上規則將導致重大損失。
 """
-    result = None
-    try:
-        result = call_llm(
-            prompt,
-            response_mode=ResponseMode.STRING
-        )
-    except Exception as e:
-        raise e
-
-    return result
+    return prompt
@@ -0,0 +1,340 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+import numpy as np
+import geopandas as gpd
+import shapely
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from scipy.spatial import cKDTree
+
+from config.consts import (
+    WALK_GRAPH_DIR,
+    WALK_GRAPH_MAX_AGE_SECONDS,
+    WALK_GRAPH_MAX_GRAPHS,
+    WALK_MAX_MINUTES,
+    WALK_SPEED_M_PER_MIN,
+)
+from services.poi_tiles import Tile, tile_bounds, tile_of
+from structs.adress_point import Coordinates
+from utils.geo import local_lnglat, local_xy, representative_xy
+from utils.singleflight import SingleFlight
+
+
+# 路網以 z14 圖磚（台灣約 2.2 公里見方）為單位建立，並向外延伸最長步行距離，
+# 圖磚內任一點出發的等時圈都落在同一張路網內
+GRAPH_ZOOM = 14
+# 等時圈：可達路段每隔 _ISOCHRONE_SPACING_M 取點做凹包（ratio 越小越貼合路網），再向外擴 _ISOCHRONE_BUFFER_M
+# 逐段緩衝後聯集在 2000 條路段時約需 0.3 ~ 0.8 秒，凹包只需數毫秒
+_ISOCHRONE_SPACING_M = 50
+_ISOCHRONE_CONCAVE_RATIO = 0.2
+_ISOCHRONE_BUFFER_M = 25
+
+
+class WalkGraph:
+    """
+    精簡的步行路網：節點經緯度與無向路段（端點索引、長度），
+    平行路段只保留最短者。最短路徑以 scipy 稀疏矩陣計算，不保留 networkx 物件。
+    """
+
+    def __init__(
+            self,
+            lng0: float,
+            lat0: float,
+            lng: np.ndarray,
+            lat: np.ndarray,
+            u: np.ndarray,
+            v: np.ndarray,
+            length: np.ndarray
+    ):
+        """
+        :param lng0: 局部平面座標原點經度（圖磚中心）
+        :param lat0: 局部平面座標原點緯度
+        :param u: 路段起點索引
+        :param v: 路段終點索引
+        :param length: 路段長度（公尺）
+        """
+        self.lng0, self.lat0 = lng0, lat0
+        self.lng, self.lat = lng, lat
+        self.u, self.v, self.length = u, v, length
+        self.xy = np.column_stack(local_xy(lng0, lat0, lng, lat))
+        self.tree = cKDTree(self.xy) if len(lng) else None
+        n = len(lng)
+        self.matrix = csr_matrix((length.astype(float), (u, v)), shape=(n, n))
+
+    @classmethod
+    def from_networkx(cls, graph, lng0: float, lat0: float) -> "WalkGraph":
+        """
+        由 osmnx 路網建立（節點需有 x、y，路段需有 length）
+        """
+        nodes = list(graph.nodes)
+        index = {node: i for i, node in enumerate(nodes)}
+        lng = np.array([graph.nodes[node]["x"] for node in nodes], dtype=float)
+        lat = np.array([graph.nodes[node]["y"] for node in nodes], dtype=float)
+        edges = np.array([
+            (index[a], index[b], data["length"])
+            for a, b, data in graph.edges(data=True) if a != b
+        ], dtype=float).reshape(-1, 3)
+
+        # 無向化，同一對節點只保留最短路段（稀疏矩陣會把重複項相加）
+        a = np.minimum(edges[:, 0], edges[:, 1]).astype(np.int32)
+        b = np.maximum(edges[:, 0], edges[:, 1]).astype(np.int32)
+        length = edges[:, 2]
+        order = np.lexsort((length, b, a))
+        a, b, length = a[order], b[order], length[order]
+        keep = np.ones(len(a), dtype=bool)
+        keep[1:] = (a[1:] != a[:-1]) | (b[1:] != b[:-1])
+        return cls(lng0, lat0, lng, lat, a[keep], b[keep], length[keep].astype(np.float32))
+
+    @classmethod
+    def load(cls, path: str) -> "WalkGraph":
+        with np.load(path) as data:
+            return cls(
+                float(data["origin"][0]), float(data["origin"][1]),
+                data["lng"], data["lat"], data["u"], data["v"], data["length"],
+            )
+
+    def save(self, path: str) -> None:
+        """
+        寫入暫存檔後再換上，其他 worker 不會讀到寫到一半的檔案
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + ".tmp.npz"
+        np.savez_compressed(
+            tmp_path,
+            origin=np.array([self.lng0, self.lat0]),
+            lng=self.lng, lat=self.lat, u=self.u, v=self.v, length=self.length,
+        )
+        os.replace(tmp_path, path)
+
+    @property
+    def node_count(self) -> int:
+        return len(self.lng)
+
+    def snap(self, lngs, lats) -> tuple[np.ndarray, np.ndarray]:
+        """
+        :return: (最近節點索引, 到最近節點的直線距離（公尺）)
+        """
+        distance, idx = self.tree.query(np.column_stack(local_xy(self.lng0, self.lat0, lngs, lats)))
+        return idx, distance
+
+    def distances_from(self, lng: float, lat: float, limit: float) -> np.ndarray:
+        """
+        由座標出發到所有節點的路網距離（含到最近節點的直線距離），超過 limit 者為 inf
+        """
+        idx, snap = self.snap([lng], [lat])
+        distance = dijkstra(
+            self.matrix, directed=False, indices=int(idx[0]), limit=max(limit - snap[0], 0.0))
+        return distance + snap[0]
+
+    def isochrone(self, lng: float, lat: float, distance: np.ndarray, limit: float):
+        """
+        由 distances_from 的結果建立 limit 公尺內可達的範圍
+        單端可達的路段由可達端延伸剩餘距離；兩端皆可達的路段視為整段可達
+        以凹包表示，不保留範圍內的孔洞
+        :return: 經緯度多邊形
+        """
+        du, dv = distance[self.u], distance[self.v]
+        reach_u, reach_v = du <= limit, dv <= limit
+        selected = reach_u | reach_v
+
+        start = np.where(reach_u, self.u, self.v)[selected]
+        end = np.where(reach_u, self.v, self.u)[selected]
+        remaining = (limit - np.where(reach_u, du, dv))[selected]
+        ratio = np.where(
+            (reach_u & reach_v)[selected], 1.0,
+            np.clip(remaining / np.maximum(self.length[selected], 1e-6), 0.0, 1.0))
+
+        # 可達部分的路段，加上起點到最近節點的連接線
+        p0 = self.xy[start]
+        p1 = p0 + (self.xy[end] - p0) * ratio[:, None]
+        origin = np.column_stack(local_xy(self.lng0, self.lat0, [lng], [lat]))
+        nearest = self.xy[self.snap([lng], [lat])[0]]
+        p0, p1 = np.vstack([p0, origin]), np.vstack([p1, nearest])
+
+        # 每段沿線等距取點（含兩端）
+        steps = np.maximum(np.ceil(np.hypot(*(p1 - p0).T) / _ISOCHRONE_SPACING_M), 1).astype(int)
+        counts = steps + 1
+        segment = np.repeat(np.arange(len(steps)), counts)
+        t = (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)) / steps[segment]
+        points = shapely.multipoints(p0[segment] + (p1 - p0)[segment] * t[:, None])
+
+        area = shapely.buffer(
+            shapely.concave_hull(points, ratio=_ISOCHRONE_CONCAVE_RATIO),
+            _ISOCHRONE_BUFFER_M, quad_segs=2)
+        return shapely.transform(
+            area, lambda coords: np.column_stack(
+                local_lnglat(self.lng0, self.lat0, coords[:, 0], coords[:, 1])))
+
+
+class WalkGraphCache:
+    """
+    程序內的路網快取（超過 max_graphs 時淘汰最久未使用者），磁碟上另存 .npz 供重啟與其他 worker 使用。
+    同一圖磚同時請求時只載入或建立一次。僅在 event loop 中使用，不需加鎖。
+    """
+
+    def __init__(self, directory: str, max_age: float, max_graphs: int):
+        self.directory = directory
+        self.max_age = max_age
+        self.max_graphs = max_graphs
+        self.graphs: OrderedDict[Tile, WalkGraph] = OrderedDict()
+        self.inflight = SingleFlight()
+        self.hits = 0
+        self.disk_loads = 0
+        self.builds = 0
+
+    async def get(self, tile: Tile) -> WalkGraph:
+        graph = self.graphs.get(tile)
+        if graph is not None:
+            self.hits += 1
+            self.graphs.move_to_end(tile)
+            return graph
+
+        graph = await self.inflight.do(tile, lambda: asyncio.to_thread(self._load_or_build, tile))
+        self.graphs[tile] = graph
+        self.graphs.move_to_end(tile)
+        while len(self.graphs) > self.max_graphs:
+            self.graphs.popitem(last=False)
+        return graph
+
+    def _path(self, tile: Tile) -> str:
+        return os.path.join(self.directory, f"walk_{GRAPH_ZOOM}_{tile[0]}_{tile[1]}.npz")
+
+    def _load_or_build(self, tile: Tile) -> WalkGraph:
+        path = self._path(tile)
+        if os.path.exists(path) and time.time() - os.path.getmtime(path) <= self.max_age:
+            self.disk_loads += 1
+            return WalkGraph.load(path)
+        try:
+            graph = build_walk_graph(tile)
+        except Exception as e:
+            # 無法重新下載時沿用過期的檔案
+            if os.path.exists(path):
+                print(f"建立步行路網 {tile} 失敗，沿用既有檔案: {e}")
+                self.disk_loads += 1
+                return WalkGraph.load(path)
+            raise
+        self.builds += 1
+        graph.save(path)
+        return graph
+
+    def stats(self) -> dict:
+        return {
+            "graphs": len(self.graphs),
+            "max_graphs": self.max_graphs,
+            "hits": self.hits,
+            "disk_loads": self.disk_loads,
+            "builds": self.builds,
+            **self.inflight.stats(),
+        }
+
+
+def build_walk_graph(tile: Tile) -> WalkGraph:
+    """
+    由 Overpass 下載圖磚向外延伸 WALK_MAX_MINUTES 步行距離範圍內的步行路網
+    """
+    import osmnx as ox
+    from osmnx._errors import InsufficientResponseError
+
+    west, south, east, north = tile_bounds(tile, GRAPH_ZOOM)
+    margin = WALK_MAX_MINUTES * WALK_SPEED_M_PER_MIN
+    (min_lng,), (min_lat,) = local_lnglat(west, south, [-margin], [-margin])
+    (max_lng,), (max_lat,) = local_lnglat(east, north, [margin], [margin])
+    lng0, lat0 = (west + east) / 2, (south + north) / 2
+
+    start = time.perf_counter()
+    try:
+        graph = ox.graph_from_polygon(
+            shapely.box(min_lng, min_lat, max_lng, max_lat), network_type="walk", retain_all=True)
+    except InsufficientResponseError:
+        # 範圍內沒有步行路網（如海面），存成空路網以免重複查詢
+        empty = np.array([], dtype=float)
+        return WalkGraph(lng0, lat0, empty, empty,
+                         empty.astype(np.int32), empty.astype(np.int32), empty.astype(np.float32))
+    walk_graph = WalkGraph.from_networkx(graph, lng0, lat0)
+    print(f"步行路網 {tile} 建立完成，{walk_graph.node_count} 個節點，"
+          f"耗時 {time.perf_counter() - start:.1f} 秒")
+    return walk_graph
+
+
+WALK_GRAPH_CACHE = WalkGraphCache(
+    WALK_GRAPH_DIR, max_age=WALK_GRAPH_MAX_AGE_SECONDS, max_graphs=WALK_GRAPH_MAX_GRAPHS)
+
+
+async def walk_access(
+        coordinates: Coordinates,
+        minutes: list[int],
+        pois: gpd.GeoDataFrame = None
+) -> tuple[gpd.GeoDataFrame, gpd.GeoDataFrame | None]:
+    """
+    計算步行等時圈與各 POI 的路網距離；兩者共用同一次最短路徑計算
+    :param minutes: 步行分鐘數（由小到大）
+    :param pois: 需要計算路網距離的 POI（可為 None）
+    :return: (等時圈 GeoDataFrame：minutes、distance、geometry,
+              加上 network_distance、walk_minutes 欄位的 POI；超出最長步行距離者為 NaN)
+    """
+    graph = await WALK_GRAPH_CACHE.get(tile_of(coordinates.lng, coordinates.lat, GRAPH_ZOOM))
+    if graph.node_count == 0:
+        raise ValueError("該座標附近查無步行路網。")
+    return await asyncio.to_thread(_walk_access, graph, coordinates, minutes, pois)
+
+
+def _walk_access(
+        graph: WalkGraph,
+        coordinates: Coordinates,
+        minutes: list[int],
+        pois: gpd.GeoDataFrame = None
+) -> tuple[gpd.GeoDataFrame, gpd.GeoDataFrame | None]:
+    limits = [m * WALK_SPEED_M_PER_MIN for m in minutes]
+    distance = graph.distances_from(coordinates.lng, coordinates.lat, limits[-1])
+
+    isochrones = gpd.GeoDataFrame({
+        "minutes": minutes,
+        "distance": limits,
+    }, geometry=[
+        graph.isochrone(coordinates.lng, coordinates.lat, distance, limit) for limit in limits
+    ], crs="EPSG:4326")
+
+    if pois is None:
+        return isochrones, None
+    pois = pois.copy()
+    if pois.empty:
+        pois["network_distance"] = []
+        pois["walk_minutes"] = []
+        return isochrones, pois
+
+    # 路網為無向圖，由起點出發的一次計算即涵蓋所有 POI 的最近節點
+    x, y = representative_xy(pois.geometry.values)
+    idx, snap = graph.snap(x, y)
+    network_distance = distance[idx] + snap
+    network_distance[network_distance > limits[-1]] = np.nan
+    pois["network_distance"] = network_distance
+    pois["walk_minutes"] = network_distance / WALK_SPEED_M_PER_MIN
+    return isochrones, pois
+
+
+if __name__ == "__main__":
+    # 量測路網載入（下載 / 磁碟 / 記憶體）與單次請求計算的耗時
+    # 於 backend 目錄下執行：python -m services.walk_network
+    from services.poi import get_nearby_poi
+
+    async def _main():
+        coordinates = Coordinates(lat=25.0330, lng=121.5654)
+        tile = tile_of(coordinates.lng, coordinates.lat, GRAPH_ZOOM)
+        for label in ("首次（下載或讀檔）", "記憶體快取"):
+            t0 = time.perf_counter()
+            graph = await WALK_GRAPH_CACHE.get(tile)
+            print(f"{label}：{graph.node_count} 個節點，{(time.perf_counter() - t0) * 1000:.0f} ms")
+
+        pois = await get_nearby_poi(coordinates, distance=int(WALK_MAX_MINUTES * WALK_SPEED_M_PER_MIN))
+        t0 = time.perf_counter()
+        isochrones, pois = await walk_access(coordinates, [5, 10, 15], pois)
+        print(f"等時圈與 {len(pois)} 個 POI 路網距離：{(time.perf_counter() - t0) * 1000:.0f} ms")
+        print(isochrones.assign(area=isochrones.to_crs(epsg=3826).area)[["minutes", "area"]])
+        print(pois[["name", "distance", "network_distance"]].head(10))
+        print(WALK_GRAPH_CACHE.stats())
+
+    asyncio.run(_main())
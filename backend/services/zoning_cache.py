@@ -0,0 +1,106 @@
+import math
+from collections import OrderedDict
+from typing import Optional
+
+from structs.adress_point import Coordinates
+from structs.zoing import Zoning
+
+
+_METERS_PER_DEGREE_LAT = 111_320
+_REFERENCE_LAT = 23.5  # 台灣中心緯度，用於換算經度方向的格網大小
+
+# 標記「跨越分區或公有地邊界」的格網，需逐點精確查詢
+_BOUNDARY = object()
+
+
+class ZoningGridCache:
+    """
+    以固定格網（約 cell_meters 公尺見方）為鍵的使用分區快取。
+    只有整格完全落在同一分區、同一公有地狀態內時才快取該格答案；
+    跨越邊界的格網只記錄為邊界格，之後一律走精確查詢。
+    格網是否可快取由呼叫端判斷後以 put / mark_boundary 寫入。
+    僅在 event loop 中使用，不需加鎖。
+    """
+
+    def __init__(self, cell_meters: float = 20, max_cells: int = 100_000):
+        self.cell_lat = cell_meters / _METERS_PER_DEGREE_LAT
+        self.cell_lng = cell_meters / (
+            _METERS_PER_DEGREE_LAT * math.cos(math.radians(_REFERENCE_LAT))
+        )
+        self.max_cells = max_cells
+        self.cells: OrderedDict[tuple[int, int], object] = OrderedDict()
+        self.data_version: Optional[str] = None
+        # 每次清空遞增；查詢前記下，結果寫回前比對，避免清空前開始的查詢寫入舊答案
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.boundary_hits = 0
+
+    def cell_of(self, coordinates: Coordinates) -> tuple[int, int]:
+        return (
+            math.floor(coordinates.lng / self.cell_lng),
+            math.floor(coordinates.lat / self.cell_lat),
+        )
+
+    def cell_bounds(self, cell: tuple[int, int]) -> tuple[float, float, float, float]:
+        """
+        :return: (xmin, ymin, xmax, ymax)
+        """
+        i, j = cell
+        return (
+            i * self.cell_lng,
+            j * self.cell_lat,
+            (i + 1) * self.cell_lng,
+            (j + 1) * self.cell_lat,
+        )
+
+    def get(self, coordinates: Coordinates) -> Optional[Zoning]:
+        """
+        :return: 快取的 Zoning；未快取或為邊界格時回傳 None
+        """
+        cell = self.cell_of(coordinates)
+        value = self.cells.get(cell)
+        if value is None:
+            self.misses += 1
+            return None
+        self.cells.move_to_end(cell)
+        if value is _BOUNDARY:
+            self.boundary_hits += 1
+            return None
+        self.hits += 1
+        return value
+
+    def is_known(self, cell: tuple[int, int]) -> bool:
+        return cell in self.cells
+
+    def put(self, cell: tuple[int, int], zoning: Zoning) -> None:
+        self._store(cell, zoning)
+
+    def mark_boundary(self, cell: tuple[int, int]) -> None:
+        self._store(cell, _BOUNDARY)
+
+    def _store(self, cell: tuple[int, int], value: object) -> None:
+        self.cells[cell] = value
+        self.cells.move_to_end(cell)
+        while len(self.cells) > self.max_cells:
+            self.cells.popitem(last=False)
+
+    def invalidate(self, data_version: Optional[str] = None) -> None:
+        """
+        分區資料重新匯入後清空快取
+        """
+        self.cells.clear()
+        self.data_version = data_version
+        self.generation += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.boundary_hits
+        return {
+            "cells": len(self.cells),
+            "max_cells": self.max_cells,
+            "hits": self.hits,
+            "misses": self.misses,
+            "boundary": self.boundary_hits,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "data_version": self.data_version,
+        }
@@ -0,0 +1,16 @@
+from dataclasses import dataclass
+from typing import Optional
+from structs.adress_point import Coordinates
+from structs.zoing import Zoning
+
+
+@dataclass
+class IntersectBatchItem:
+    """
+    Class representing one item of a batch intersect result.
+    查詢失敗時 zoning 為 None，並於 error 說明原因
+    """
+    address: Optional[str] = None
+    coordinates: Optional[Coordinates] = None
+    zoning: Optional[Zoning] = None
+    error: Optional[str] = None
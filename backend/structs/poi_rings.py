@@ -0,0 +1,34 @@
+from dataclasses import dataclass, field
+from typing import Optional
+
+
+@dataclass
+class RingStats:
+    """
+    Class representing POI statistics of one poi_type within one radius.
+    """
+    radius: int  # 半徑（公尺）
+    count: int  # 半徑內的 POI 數
+    ring_count: int  # 上一個半徑到此半徑之間（環帶）的 POI 數
+    density: float  # 每平方公里 POI 數
+
+
+@dataclass
+class PoiTypeRings:
+    """
+    Class representing ring statistics of one poi_type.
+    """
+    poi_type: str
+    nearest_distance: Optional[float] = None  # 最近 POI 的距離（公尺），最大半徑內沒有時為 None
+    rings: list[RingStats] = field(default_factory=list)
+
+
+@dataclass
+class NearbyPoiRings:
+    """
+    Class representing multi-radius POI statistics around a point.
+    features 僅在要求時附上（GeoJSON FeatureCollection）
+    """
+    radii: list[int]
+    stats: list[PoiTypeRings]
+    features: Optional[dict] = None
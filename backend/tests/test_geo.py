@@ -0,0 +1,74 @@
+"""
+utils.geo 的準確度測試：以 pyproj Geod（WGS84 測地線）為基準，涵蓋台灣本島到離島的緯度
+於專案根目錄執行：pytest
+"""
+import numpy as np
+import pytest
+import shapely
+from pyproj import Geod
+
+from utils.geo import distance_m, geodesic_buffer, local_lnglat, local_xy
+
+GEOD = Geod(ellps="WGS84")
+
+# 鵝鑾鼻、台灣中部、台北、馬祖附近的緯度
+TAIWAN_LATS = [21.9, 23.5, 25.03, 26.2]
+ORIGIN_LNG = 121.0
+
+
+def _targets(lat: float, max_distance: float, n: int = 2000, seed: int = 0):
+    """
+    由原點沿隨機方位與距離以測地線正算出目標點
+    :return: (經度陣列, 緯度陣列, 測地線距離陣列)
+    """
+    rng = np.random.default_rng(seed)
+    azimuths = rng.uniform(0, 360, n)
+    distances = rng.uniform(1, max_distance, n)
+    lngs, lats, _ = GEOD.fwd(np.full(n, ORIGIN_LNG), np.full(n, lat), azimuths, distances)
+    return lngs, lats, distances
+
+
+@pytest.mark.parametrize("lat", TAIWAN_LATS)
+@pytest.mark.parametrize("max_distance, tolerance", [
+    (5_000, 1e-7),  # POI 查詢與步行範圍：5 公里內相對誤差小於 1e-7（5 公里約 0.5 mm）
+    (100_000, 1e-5),  # 100 公里內相對誤差小於 1e-5
+])
+def test_distance_m_matches_geodesic(lat, max_distance, tolerance):
+    lngs, lats, _ = _targets(lat, max_distance)
+    _, _, truth = GEOD.inv(np.full(len(lngs), ORIGIN_LNG), np.full(len(lngs), lat), lngs, lats)
+
+    result = distance_m(ORIGIN_LNG, lat, lngs, lats)
+    assert np.max(np.abs(result - truth) / truth) < tolerance
+
+
+def test_distance_m_same_point_is_zero():
+    assert distance_m(ORIGIN_LNG, 25.03, [ORIGIN_LNG], [25.03])[0] == 0
+
+
+@pytest.mark.parametrize("lat", TAIWAN_LATS)
+@pytest.mark.parametrize("radius", [100, 500, 3_000])
+def test_geodesic_buffer_vertices_on_circle(lat, radius):
+    ring = np.asarray(geodesic_buffer(ORIGIN_LNG, lat, radius).exterior.coords)[:-1]
+    _, _, truth = GEOD.inv(
+        np.full(len(ring), ORIGIN_LNG), np.full(len(ring), lat), ring[:, 0], ring[:, 1])
+    # 每個頂點到圓心的測地線距離與半徑相差小於 1 mm
+    assert np.max(np.abs(truth - radius)) < 1e-3
+
+
+def test_geodesic_buffer_contains_points_within_radius():
+    lngs, lats, distances = _targets(25.03, 600)
+    buffer = geodesic_buffer(ORIGIN_LNG, 25.03, 500)
+    # 64 邊形的弦與圓最多相差 500 * (1 - cos(π / 64)) ≈ 0.6 m
+    inside = distances < 499
+    outside = distances > 501
+    contained = shapely.contains_xy(buffer, lngs, lats)
+    assert contained[inside].all()
+    assert not contained[outside].any()
+
+
+def test_local_xy_round_trip():
+    lngs, lats, _ = _targets(25.03, 3_000)
+    x, y = local_xy(ORIGIN_LNG, 25.03, lngs, lats)
+    back_lngs, back_lats = local_lnglat(ORIGIN_LNG, 25.03, x, y)
+    np.testing.assert_allclose(back_lngs, lngs, rtol=0, atol=1e-12)
+    np.testing.assert_allclose(back_lats, lats, rtol=0, atol=1e-12)
@@ -0,0 +1,47 @@
+import re
+import unicodedata
+
+
+# 開頭的郵遞區號（3、5 或 6 碼）
+_POSTAL_CODE = re.compile(r"^\d{3}(?:\d{2,3})?")
+# 國名後須接郵遞區號或縣市，避免誤刪「台灣大道」等路名
+_COUNTRY_PREFIX = re.compile(r"^(?:中華民國|台灣省?)(?=\d|..[市縣])")
+_WHITESPACE = re.compile(r"\s+")
+# 「忠孝東路四段」與「忠孝東路4段」視為相同（巷、弄、號、樓亦同）
+_CHINESE_NUMBER = re.compile(r"([一二三四五六七八九十]+)(段|巷|弄|號|樓)")
+# 「12-1號」與「12之1號」視為相同
+_DASH_NUMBER = re.compile(r"(\d+)[-‐–—~](\d+)")
+
+_CHINESE_DIGITS = {
+    "一": 1, "二": 2, "三": 3, "四": 4, "五": 5,
+    "六": 6, "七": 7, "八": 8, "九": 9,
+}
+
+
+def normalize_address(address: str) -> str:
+    """
+    將台灣地址轉為標準寫法，供快取鍵與地址比對使用：
+    全形轉半形、臺 ➜ 台、去除空白與開頭的郵遞區號 / 國名、段巷弄號樓的中文數字改為阿拉伯數字
+    """
+    if not address:
+        return ""
+    text = unicodedata.normalize("NFKC", address)
+    text = _WHITESPACE.sub("", text)
+    text = text.replace("臺", "台")
+    text = _POSTAL_CODE.sub("", text)
+    text = _COUNTRY_PREFIX.sub("", text)
+    text = _POSTAL_CODE.sub("", text)  # 「台灣100台北市…」
+    text = _CHINESE_NUMBER.sub(
+        lambda m: f"{_chinese_to_int(m.group(1))}{m.group(2)}", text)
+    text = _DASH_NUMBER.sub(r"\1之\2", text)
+    return text
+
+
+def _chinese_to_int(text: str) -> int:
+    """
+    一 ~ 九十九 的中文數字轉整數
+    """
+    if "十" not in text:
+        return _CHINESE_DIGITS.get(text, 0)
+    tens, _, ones = text.partition("十")
+    return (_CHINESE_DIGITS.get(tens, 1) if tens else 1) * 10 + _CHINESE_DIGITS.get(ones, 0)
@@ -0,0 +1,47 @@
+import asyncio
+from typing import Any, AsyncIterator, Optional
+
+
+class Broadcast:
+    """
+    單一生產者、多個消費者的片段串流：已產生的片段全部保留，
+    後加入的消費者先重播既有片段，再接收之後的片段。僅在 event loop 中使用，不需加鎖。
+    """
+
+    def __init__(self):
+        self.chunks: list = []
+        self.closed = False
+        self.error: Optional[BaseException] = None
+        self._changed = asyncio.Event()
+
+    def publish(self, chunk: Any) -> None:
+        self.chunks.append(chunk)
+        self._notify()
+
+    def close(self, error: BaseException = None) -> None:
+        """
+        :param error: 生產者失敗時的例外，消費者讀完既有片段後會拋出
+        """
+        self.closed = True
+        self.error = error
+        self._notify()
+
+    def _notify(self) -> None:
+        # 喚醒所有等待中的消費者，之後的等待改用新的 Event
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def subscribe(self) -> AsyncIterator[Any]:
+        """
+        :return: 從第一個片段開始依序產生，生產者結束時停止
+        """
+        index = 0
+        while True:
+            while index < len(self.chunks):
+                yield self.chunks[index]
+                index += 1
+            if self.closed:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self._changed.wait()
@@ -3,10 +3,15 @@ import hashlib
 import pickle
 import asyncio
 import inspect
-from typing import Any, Callable
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Callable
 from functools import wraps
 from threading import Lock
 
+from utils.broadcast import Broadcast
+from utils.singleflight import SingleFlight
+from utils.sqlite_cache import SQLiteCache
+
 
 TOP_K = 20  # 預設保留的 top K 個 cache
 MIN_LIFETIME_SECONDS = 5*60  # 預設最小生命週期
@@ -101,21 +106,49 @@ class SmartCacheManager:
 # 全域統一一個 SmartCacheManager
 _default_manager = SmartCacheManager(
     min_lifetime_seconds=MIN_LIFETIME_SECONDS, top_k=TOP_K)
+# 快取未命中、相同鍵正在計算時，後到者等待同一個結果（如多位使用者同時查詢同一地址的 LLM 分析）；
+# 所有等待者都取消時才取消計算
+_default_inflight = SingleFlight(cancel_abandoned=True)
+# 由 cache_stream 啟動、進行中的工作 ➜ 其片段串流；相同鍵的串流請求共用同一個生成
+_default_streams: dict[asyncio.Future, Broadcast] = {}
 
 
-def smart_cache(key: str = "", expire: int = None, verbose: bool = False):
+def smart_cache_stats() -> dict:
+    """
+    快取筆數與合併進行中呼叫的統計
+    """
+    return {
+        "entries": len(_default_manager.cache),
+        "streams": len(_default_streams),
+        **_default_inflight.stats(),
+    }
+
+
+def smart_cache(
+        key: str = "",
+        expire: int = None,
+        verbose: bool = False,
+        key_func: Callable[..., str] = None,
+        store: SQLiteCache = None,
+        store_ttl: int = 7 * 24 * 3600
+):
     """
     智慧快取裝飾器。
+    非同步函式在相同參數正在計算時，後到的呼叫會等待同一個結果（或例外）。
     - key: 快取key（如果不填則用函式名稱）
     - expire: 最大保留秒數（None代表無限）
     - verbose: 是否顯示 cache hit/miss
+    - key_func: 由函式參數產生快取鍵（如標準化後的輸入），未指定時使用參數的 pickle 雜湊
+    - store: 記憶體未命中時再查詢的持久化快取（值需可序列化為 JSON），跨重啟與 worker 共用
+    - store_ttl: 持久化快取的存活秒數
     """
     def decorator(func: Callable[..., Any]):
         sig = inspect.signature(func)
         is_async = asyncio.iscoroutinefunction(func)
 
-        @wraps(func)
-        async def async_wrapper(*args, **kwargs):
+        def make_key(*args, **kwargs) -> str:
+            if key_func is not None:
+                return (key or func.__name__) + ":" + key_func(*args, **kwargs)
             bound_args = sig.bind(*args, **kwargs)
             bound_args.apply_defaults()
 
@@ -123,35 +156,64 @@ def smart_cache(key: str = "", expire: int = None, verbose: bool = False):
             param_bytes = pickle.dumps(sorted_items)
             param_hash = hashlib.md5(param_bytes).hexdigest()
 
-            use_key = (key or func.__name__) + ":" + param_hash
+            return (key or func.__name__) + ":" + param_hash
+
+        def load(use_key: str):
+            found, cached = store.get(use_key)
+            if found and cached is not None:
+                _default_manager.set(use_key, cached, max_lifetime=expire)
+                return cached
+            return None
+
+        def lookup(use_key: str):
+            cached = _default_manager.get(use_key)
+            if cached is None and store is not None:
+                cached = load(use_key)
+            return cached
+
+        def save(use_key: str, result: Any) -> None:
+            _default_manager.set(use_key, result, max_lifetime=expire)
+            if store is not None and result is not None:
+                store.set(use_key, result, store_ttl)
 
+        # 非同步版本：記憶體快取直接查詢，SQLite 讀寫（含過期清理）為阻塞 I/O，移到 thread 執行避免卡住 event loop
+        async def lookup_async(use_key: str):
             cached = _default_manager.get(use_key)
+            if cached is None and store is not None:
+                cached = await asyncio.to_thread(load, use_key)
+            return cached
+
+        async def save_async(use_key: str, result: Any) -> None:
+            _default_manager.set(use_key, result, max_lifetime=expire)
+            if store is not None and result is not None:
+                await asyncio.to_thread(store.set, use_key, result, store_ttl)
+
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            use_key = make_key(*args, **kwargs)
+
+            cached = await lookup_async(use_key)
             if cached is not None:
                 if verbose:
                     print(
                         f"[CACHE HIT] {func.__name__} args={args} kwargs={kwargs}")
                 return cached
 
-            result = await func(*args, **kwargs)
+            async def compute():
+                result = await func(*args, **kwargs)
+                if verbose:
+                    print(
+                        f"[CACHE MISS] {func.__name__} args={args} kwargs={kwargs}")
+                await save_async(use_key, result)
+                return result
 
-            if verbose:
-                print(
-                    f"[CACHE MISS] {func.__name__} args={args} kwargs={kwargs}")
-            _default_manager.set(use_key, result, max_lifetime=expire)
-            return result
+            return await _default_inflight.do(use_key, compute)
 
         @wraps(func)
         def sync_wrapper(*args, **kwargs):
-            bound_args = sig.bind(*args, **kwargs)
-            bound_args.apply_defaults()
+            use_key = make_key(*args, **kwargs)
 
-            sorted_items = tuple(sorted(bound_args.arguments.items()))
-            param_bytes = pickle.dumps(sorted_items)
-            param_hash = hashlib.md5(param_bytes).hexdigest()
-
-            use_key = (key or func.__name__) + ":" + param_hash
-
-            cached = _default_manager.get(use_key)
+            cached = lookup(use_key)
             if cached is not None:
                 if verbose:
                     print(
@@ -163,9 +225,62 @@ def smart_cache(key: str = "", expire: int = None, verbose: bool = False):
             if verbose:
                 print(
                     f"[CACHE MISS] {func.__name__} args={args} kwargs={kwargs}")
-            _default_manager.set(use_key, result, max_lifetime=expire)
+            save(use_key, result)
             return result
 
-        return async_wrapper if is_async else sync_wrapper
+        async def cache_stream(
+                produce: Callable[[], AsyncIterator[Any]],
+                finish: Callable[[list], Any],
+                *args, **kwargs
+        ) -> AsyncIterator[tuple[str, Any]]:
+            """
+            串流版的函式呼叫，與函式呼叫共用快取及進行中的合併：
+            相同參數已有串流進行中時，重播並接收同一個生成的片段；已有一般呼叫進行中時，等待其結果。
+            所有請求都離開時才取消生成。
+            :param produce: 無參數、產生片段的非同步產生器函式（如 LLM 串流），只有在需要生成時才呼叫
+            :param finish: 由全部片段組成函式結果（寫入快取）
+            :return: 依序產生 ("chunk", 片段)，最後產生 ("result", 結果)；
+                     命中快取或共用一般呼叫時只產生 ("result", 結果)
+            """
+            use_key = make_key(*args, **kwargs)
+
+            cached = await lookup_async(use_key)
+            if cached is not None:
+                yield "result", cached
+                return
+
+            broadcast = Broadcast()
+
+            async def generate():
+                try:
+                    async with aclosing(produce()) as stream:
+                        async for chunk in stream:
+                            broadcast.publish(chunk)
+                    result = finish(broadcast.chunks)
+                except BaseException as e:
+                    broadcast.close(e)
+                    raise
+                broadcast.close()
+                await save_async(use_key, result)
+                return result
+
+            future, started = _default_inflight.acquire(use_key, generate)
+            if started:
+                _default_streams[future] = broadcast
+                future.add_done_callback(lambda f: _default_streams.pop(f, None))
+            shared = _default_streams.get(future)
+            try:
+                if shared is not None:
+                    async for chunk in shared.subscribe():
+                        yield "chunk", chunk
+                yield "result", await asyncio.shield(future)
+            finally:
+                _default_inflight.release(use_key, future)
+
+        if not is_async:
+            return sync_wrapper
+        # 串流等另外產生結果的路徑使用，與函式呼叫共用快取鍵
+        async_wrapper.cache_stream = cache_stream
+        return async_wrapper
 
     return decorator
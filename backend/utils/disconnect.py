@@ -0,0 +1,30 @@
+import asyncio
+from typing import Awaitable, TypeVar
+from fastapi import Request
+
+T = TypeVar("T")
+
+
+class ClientDisconnectedError(Exception):
+    """
+    請求端在處理完成前已中斷連線
+    """
+
+
+async def cancel_on_disconnect(request: Request, awaitable: Awaitable[T], poll_interval: float = 0.5) -> T:
+    """
+    執行 awaitable，期間定期檢查請求端連線；中斷時取消工作，避免繼續佔用 LLM 等資源
+    :param poll_interval: 檢查間隔（秒）
+    :raise ClientDisconnectedError: 請求端已中斷連線
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                raise ClientDisconnectedError()
+    finally:
+        if not task.done():
+            task.cancel()
@@ -0,0 +1,115 @@
+import math
+import numpy as np
+import geopandas as gpd
+import orjson
+import shapely
+
+from utils.geo import representative_xy
+
+
+_ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY
+
+
+def _round_geometries(geoms: np.ndarray, precision: int) -> np.ndarray:
+    return shapely.transform(geoms, lambda coords: np.round(coords, precision))
+
+
+def _is_null(value) -> bool:
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def feature_collection(
+        gdf: gpd.GeoDataFrame,
+        precision: int = 6,
+        drop_nulls: bool = True
+) -> orjson.Fragment:
+    """
+    直接將 GeoDataFrame 轉為 GeoJSON FeatureCollection（只走訪一次，幾何由 GEOS 輸出）
+    :param precision: 座標小數位數（6 位約 0.1 公尺）
+    :param drop_nulls: 是否省略值為 null / NaN 的屬性
+    :return: 已序列化的 JSON 片段，可直接放入 orjson.dumps 的物件中
+    """
+    geoms = _round_geometries(np.asarray(gdf.geometry.values, dtype=object), precision)
+    geometry_json = shapely.to_geojson(geoms)
+    props = gdf.drop(columns=gdf.geometry.name).to_dict("records")
+
+    features = []
+    for properties, geometry in zip(props, geometry_json):
+        if drop_nulls:
+            properties = {k: v for k, v in properties.items() if not _is_null(v)}
+        features.append({
+            "type": "Feature",
+            "properties": properties,
+            "geometry": orjson.Fragment(geometry) if geometry is not None else None,
+        })
+    return orjson.Fragment(orjson.dumps(
+        {"type": "FeatureCollection", "features": features}, option=_ORJSON_OPTIONS))
+
+
+def columnar(gdf: gpd.GeoDataFrame, precision: int = 6) -> orjson.Fragment:
+    """
+    欄式精簡格式，供地圖前端直接畫點：每個欄位一個陣列，幾何以代表點的經緯度表示
+    {"count": n, "lng": [...], "lat": [...], "properties": {"name": [...], ...}}
+    缺值保留為 null 以維持各陣列對齊
+    """
+    x, y = representative_xy(gdf.geometry.values) if len(gdf) else ([], [])
+    properties = {}
+    for column in gdf.columns:
+        if column == gdf.geometry.name:
+            continue
+        values = gdf[column].astype(object).where(gdf[column].notna(), None)
+        properties[column] = values.tolist()
+    return orjson.Fragment(orjson.dumps({
+        "count": len(gdf),
+        "lng": np.round(x, precision),
+        "lat": np.round(y, precision),
+        "properties": properties,
+    }, option=_ORJSON_OPTIONS))
+
+
+def dumps(obj) -> bytes:
+    """
+    以 orjson 序列化（可包含 feature_collection / columnar 回傳的片段）
+    """
+    return orjson.dumps(obj, option=_ORJSON_OPTIONS)
+
+
+if __name__ == "__main__":
+    # 量測不同 POI 數量下，舊作法（to_json ➜ json.loads ➜ JSONResponse）與直接序列化的大小與耗時
+    # 於 backend 目錄下執行：python -m utils.geojson
+    import json
+    import time
+    import pandas as pd
+
+    rng = np.random.default_rng(0)
+
+    def sample(n: int) -> gpd.GeoDataFrame:
+        has_addr = rng.random(n) < 0.2  # 大多數 POI 沒有地址標籤
+        return gpd.GeoDataFrame({
+            "poi_type": rng.choice(["food", "health", "public"], n),
+            "name": [f"POI {i}" for i in range(n)],
+            "addr:full": pd.Series(np.where(has_addr, "台北市信義區松仁路 1 號", None), dtype=object),
+            "addr:city": pd.Series(np.where(has_addr, "台北市", None), dtype=object),
+            "addr:district": pd.Series(np.where(has_addr, "信義區", None), dtype=object),
+            "distance": rng.uniform(0, 1000, n),
+        }, geometry=gpd.points_from_xy(
+            rng.uniform(121.55, 121.58, n), rng.uniform(25.02, 25.05, n)), crs="EPSG:4326")
+
+    def timeit(fn, repeat: int = 5) -> tuple[float, bytes]:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            body = fn()
+        return (time.perf_counter() - start) / repeat * 1000, body
+
+    for n in (50, 500, 5000):
+        gdf = sample(n)
+        modes = {
+            "舊作法": lambda: json.dumps(
+                {"message": None, "data": json.loads(gdf.to_json())},
+                ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+            "FeatureCollection": lambda: dumps({"message": None, "data": feature_collection(gdf)}),
+            "columnar": lambda: dumps({"message": None, "data": columnar(gdf)}),
+        }
+        for label, fn in modes.items():
+            ms, body = timeit(fn)
+            print(f"{n:>5} 筆 {label:<18} {len(body) / 1024:8.1f} KB {ms:8.2f} ms")
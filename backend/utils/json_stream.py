@@ -0,0 +1,69 @@
+import json
+from typing import Any
+
+
+class JsonArrayItemScanner:
+    """
+    逐段讀入 LLM 輸出的 JSON 文字，根物件底下陣列中的元素一完整就解析回傳，
+    例如 {"analysis": [{...}, {...}], "summary": "..."} 中 analysis 的每個物件。
+    根物件之前的文字（如 ```json）會被略過。
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.stack: list[str] = []  # 目前所在的容器（"{" 或 "["）
+        self.in_string = False
+        self.escape = False
+        self.string_start: int = None  # 根物件層級字串（鍵）的起點
+        self.key = ""  # 根物件中最近一個鍵
+        self.array_key = ""  # 目前陣列所屬的鍵
+        self.item_start: int = None  # 目前元素（根物件 ➜ 陣列 ➜ 元素）的起點
+
+    def feed(self, text: str) -> list[tuple[str, Any]]:
+        """
+        :param text: 新收到的文字
+        :return: 本次新完成的 (所屬鍵, 元素) 列表
+        """
+        start = len(self.buffer)
+        self.buffer += text
+        items = []
+        for i in range(start, len(self.buffer)):
+            char = self.buffer[i]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                    if self.string_start is not None:
+                        self.key = self.buffer[self.string_start + 1:i]
+                        self.string_start = None
+                continue
+            if not self.stack and char != "{":
+                continue  # 尚未進入根物件
+            if char == '"':
+                self.in_string = True
+                if len(self.stack) == 1:
+                    self.string_start = i
+            elif char in "{[":
+                self.stack.append(char)
+                if self.stack == ["{", "["]:
+                    self.array_key = self.key
+                elif len(self.stack) == 3 and self.stack[:2] == ["{", "["]:
+                    self.item_start = i
+            elif char in "}]" and self.stack:
+                self.stack.pop()
+                if len(self.stack) == 2 and self.item_start is not None:
+                    item = self._parse_item(i)
+                    if item is not None:
+                        items.append(item)
+        return items
+
+    def _parse_item(self, end: int) -> tuple[str, Any] | None:
+        start, self.item_start = self.item_start, None
+        try:
+            return self.array_key, json.loads(self.buffer[start:end + 1])
+        except json.JSONDecodeError:
+            # 格式有誤的元素略過，最終仍以完整結果為準
+            return None
@@ -0,0 +1,82 @@
+import asyncio
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    合併相同鍵、同時進行中的非同步呼叫：第一個呼叫者實際執行，
+    其餘呼叫者等待同一個結果（或同一個例外）。
+    任一呼叫者被取消不會中斷共用的工作。僅在 event loop 中使用，不需加鎖。
+    """
+
+    def __init__(self, cancel_abandoned: bool = False):
+        """
+        :param cancel_abandoned: 所有呼叫者都取消時是否一併取消共用的工作（如 LLM 生成），
+                                 預設讓工作完成（結果可能仍會被寫入快取）
+        """
+        self.cancel_abandoned = cancel_abandoned
+        self._calls: dict[Hashable, asyncio.Future] = {}
+        self._waiters: dict[asyncio.Future, int] = {}
+        self.calls = 0  # 實際執行次數
+        self.shared = 0  # 直接共用進行中結果的次數
+        self.abandoned = 0  # 因所有呼叫者都取消而取消的工作數
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        :param key: 合併依據
+        :param fn: 無參數的協程函式，只有在沒有相同鍵進行中時才會呼叫
+        """
+        future, _ = self.acquire(key, fn)
+        try:
+            return await asyncio.shield(future)
+        finally:
+            self.release(key, future)
+
+    def acquire(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> tuple[asyncio.Future, bool]:
+        """
+        同步取得（必要時啟動）相同鍵進行中的工作並登記為等待者，之後必須呼叫 release；
+        供無法在單一 await 中等待結果的呼叫端（如串流）使用
+        :return: (共用的工作, 是否由此次呼叫啟動)
+        """
+        future = self._calls.get(key)
+        started = future is None
+        if started:
+            self.calls += 1
+            future = asyncio.ensure_future(fn())
+            self._calls[key] = future
+            future.add_done_callback(lambda f: self._forget(key, f))
+        else:
+            self.shared += 1
+        self._waiters[future] = self._waiters.get(future, 0) + 1
+        return future, started
+
+    def release(self, key: Hashable, future: asyncio.Future) -> None:
+        """
+        取消 acquire 的登記；所有等待者都離開且 cancel_abandoned 時取消共用的工作
+        """
+        self._waiters[future] -= 1
+        if self._waiters[future] == 0:
+            del self._waiters[future]
+            if self.cancel_abandoned and not future.done():
+                # 立即移除，之後相同鍵的呼叫會重新執行而不是拿到已取消的工作
+                if self._calls.get(key) is future:
+                    del self._calls[key]
+                self.abandoned += 1
+                future.cancel()
+
+    def _forget(self, key: Hashable, future: asyncio.Future) -> None:
+        if self._calls.get(key) is future:
+            del self._calls[key]
+        # 所有呼叫者都已取消時，避免出現「例外未被取得」的警告
+        if not future.cancelled():
+            future.exception()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._calls),
+            "calls": self.calls,
+            "shared": self.shared,
+            "abandoned": self.abandoned,
+        }
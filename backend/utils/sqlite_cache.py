@@ -0,0 +1,144 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any
+
+
+class SQLiteCache:
+    """
+    以 SQLite 檔案保存的鍵值快取，重新啟動後仍有效，且可由多個 worker 程序共用。
+    使用 WAL 模式讓讀取不被寫入阻擋；值以 JSON 儲存，每筆可設定各自的存活秒數。
+    每個執行緒使用各自的連線（sqlite3 連線不可跨執行緒共用）。
+    """
+
+    def __init__(self, path: str, table: str = "cache", max_bytes: int = 0, track_access: bool = False):
+        """
+        :param max_bytes: 值的總大小上限，超過時淘汰最久未使用的項目（0 表示不限制）
+        :param track_access: 命中時是否記錄使用時間與次數（每次命中多一次寫入），
+                             未記錄時淘汰順序依寫入時間
+        """
+        self.path = path
+        self.table = table
+        self.max_bytes = max_bytes
+        self.track_access = track_access
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._conn() as conn:
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL DEFAULT 0,
+                    hit_count INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            # 舊版建立的資料表沒有使用紀錄欄位
+            columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+            for column, definition in (
+                ("accessed_at", "REAL NOT NULL DEFAULT 0"),
+                ("hit_count", "INTEGER NOT NULL DEFAULT 0"),
+            ):
+                if column not in columns:
+                    try:
+                        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+                    except sqlite3.OperationalError:
+                        pass  # 其他 worker 已同時新增
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> tuple[bool, Any]:
+        """
+        :return: (是否命中, 值)；值本身可能為 None（例如負快取）
+        """
+        row = self._conn().execute(
+            f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+        ).fetchone()
+        now = time.time()
+        if row is None or row[1] < now:
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        if self.track_access:
+            with self._conn() as conn:
+                conn.execute(
+                    f"UPDATE {self.table} SET accessed_at = ?, hit_count = hit_count + 1 WHERE key = ?",
+                    (now, key),
+                )
+        return True, json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        """
+        :param value: 可序列化為 JSON 的值
+        :param ttl: 存活秒數
+        """
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, accessed_at) "
+                f"VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now + ttl, now),
+            )
+        if self.max_bytes:
+            self.evict()
+
+    def evict(self) -> int:
+        """
+        值的總大小超過 max_bytes 時，由最近使用者往前累計，刪除累計超過上限的項目
+        :return: 刪除筆數
+        """
+        with self._conn() as conn:
+            cursor = conn.execute(f"""
+                DELETE FROM {self.table} WHERE key IN (
+                    SELECT key FROM (
+                        SELECT key, SUM(LENGTH(CAST(value AS BLOB)))
+                            OVER (ORDER BY accessed_at DESC, key) AS running_bytes
+                        FROM {self.table}
+                    ) WHERE running_bytes > ?
+                )
+            """, (self.max_bytes,))
+        self.evicted += cursor.rowcount
+        return cursor.rowcount
+
+    def delete_expired(self) -> int:
+        """
+        刪除已過期的項目
+        :return: 刪除筆數
+        """
+        with self._conn() as conn:
+            cursor = conn.execute(
+                f"DELETE FROM {self.table} WHERE expires_at < ?", (time.time(),))
+        return cursor.rowcount
+
+    def stats(self) -> dict:
+        """
+        hits、misses 為本程序的統計；entries、bytes 為所有 worker 共用的檔案內容
+        """
+        size, total_bytes = self._conn().execute(
+            f"SELECT COUNT(*), COALESCE(SUM(LENGTH(CAST(value AS BLOB))), 0) FROM {self.table}"
+        ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": size,
+            "bytes": total_bytes,
+            "max_bytes": self.max_bytes,
+            "evicted": self.evicted,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,14 @@
+import orjson
+
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # 避免 nginx 等反向代理緩衝整個回應
+}
+
+
+def sse_event(event: str, data) -> bytes:
+    """
+    組成一個 server-sent event；data 以 JSON 表示（orjson 輸出不含換行）
+    """
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"